@@ -1,18 +1,39 @@
+import os
 import streamlit as st
+import pandas as pd
 from datetime import datetime
 
+# Client mode: set AGENT_SERVICE_URL to generate through src.service instead of in-process.
+CLIENT_MODE = bool(os.getenv("AGENT_SERVICE_URL"))
+
 # Try safe imports from your agent - if a function is missing, provide a local fallback.
 try:
-    from src.agent import (
-        generate_headlines,
-        generate_body,
-        generate_adaptive_keywords,
-        refine_post,
-        generate_ctas,
-        generate_engagement_score,
-        extract_tone_from_profile,
-        conversational_followup,
-    )
+    if CLIENT_MODE:
+        from src.client import (
+            generate_headlines,
+            generate_body,
+            stream_body,
+            generate_adaptive_keywords,
+            refine_post,
+            generate_ctas,
+            generate_hashtags,
+            generate_engagement_score,
+            extract_tone_from_profile,
+            conversational_followup,
+        )
+    else:
+        from src.agent import (
+            generate_headlines,
+            generate_body,
+            stream_body,
+            generate_adaptive_keywords,
+            refine_post,
+            generate_ctas,
+            generate_hashtags,
+            generate_engagement_score,
+            extract_tone_from_profile,
+            conversational_followup,
+        )
     
 except Exception:
     # Minimal fallbacks if functions are missing so app doesn't crash.
@@ -24,9 +45,11 @@ except Exception:
 
     generate_headlines = _missing("generate_headlines")
     generate_body = _missing("generate_body")
+    stream_body = _missing("stream_body")
     generate_adaptive_keywords = _missing("generate_adaptive_keywords")
     refine_post = _missing("refine_post")
     generate_ctas = _missing("generate_ctas")
+    generate_hashtags = _missing("generate_hashtags")
     generate_engagement_score = _missing("generate_engagement_score")
     extract_tone_from_profile = _missing("extract_tone_from_profile")
 
@@ -40,12 +63,35 @@ except Exception:
             return "Any keywords you'd like included? (comma-separated)"
         return "Would you like the post shorter, more narrative, or punchier?"
 
-from src.storage import save_post, load_history, get_analytics
+from src.storage import (
+    save_post,
+    get_analytics,
+    history_frame,
+    latest_posts,
+    engagement_by,
+    keyword_lift,
+    engagement_trend,
+)
+from src.hashtags import merge_hashtags
+from src import profiler
+
+HISTORY_PAGE_SIZE = 20
+
+# Image library matching is optional (needs CLIP and a local image folder)
+try:
+    from src.image_library import IMAGE_LIBRARY_DIR, get_library, match_images
+except Exception:
+    IMAGE_LIBRARY_DIR = None
 
 # -------------------------
 # Page setup
 # -------------------------
 st.set_page_config(page_title="LinkedIn AI Agent", page_icon="🤖", layout="wide")
+
+# Opt-in rerun profiler (PROFILE_RERUNS=1 or ?profile=1); profiler.mark() calls below are no-ops otherwise
+PROFILING = profiler.is_enabled(st.query_params)
+if PROFILING:
+    profiler.start_rerun(st.session_state)
 st.title("🤖 LinkedIn AI Post Agent")
 
 # -------------------------
@@ -75,6 +121,7 @@ draft = st.session_state.draft
 # -------------------------
 st.sidebar.header("Refinement & Regeneration")
 
+profiler.mark("sidebar.headline_tools")
 st.sidebar.subheader("Headline Tools")
 headline_mode = st.sidebar.selectbox(
     "Preset headline mode (optional)",
@@ -111,6 +158,7 @@ if st.sidebar.button("Refine Headline"):
             st.sidebar.error(f"Headline refine failed: {e}")
 
 st.sidebar.markdown("---")
+profiler.mark("sidebar.body_tools")
 st.sidebar.subheader("Body Tools")
 
 body_mode = st.sidebar.selectbox(
@@ -151,6 +199,7 @@ if st.sidebar.button("Refine Body"):
             st.rerun()
 
 st.sidebar.markdown("---")
+profiler.mark("sidebar.cta_tools")
 st.sidebar.subheader("CTA Tools")
 
 cta_mode = st.sidebar.selectbox("CTA preset (optional)", ["", "short_cta", "invite_to_connect", "ask_question"], key="cta_mode")
@@ -180,6 +229,7 @@ if st.sidebar.button("Refine CTA"):
             st.rerun()
 
 st.sidebar.markdown("---")
+profiler.mark("sidebar.full_post_tools")
 st.sidebar.subheader("Full Post Tools")
 if st.sidebar.button("Regenerate Entire Post (headline, body, CTA)"):
     try:
@@ -258,6 +308,7 @@ if st.sidebar.button("Reset All & Start New Chat"):
 # -------------------------
 # Main UI - conversation & workflow
 # -------------------------
+profiler.mark("conversation")
 # Show conversation history
 for msg in st.session_state.conversation:
     with st.chat_message(msg.get("role", "assistant")):
@@ -267,6 +318,7 @@ tabs = st.tabs(["Chat Agent", "History & Analytics"])
 tab1, tab2 = tabs
 
 with tab1:
+    profiler.mark(f"chat.{st.session_state.step}")
     # Step 1: Topic
     if st.session_state.step == "topic":
         with st.form("topic_form"):
@@ -346,6 +398,7 @@ with tab1:
 
     # Step 6: Generate post UI
     if st.session_state.step == "generate_post":
+        profiler.mark("generate_post.headlines")
         # Headlines
         if not draft.get("headlines"):
             try:
@@ -371,10 +424,14 @@ with tab1:
         else:
             st.info("No headlines available. Try regenerating.")
 
-        # Body generation
+        profiler.mark("generate_post.body")
+        # Body generation (streamed into a placeholder, then handed to the editor below)
         if not draft.get("body"):
             try:
-                draft["body"] = generate_body(draft.get("headline", ""), tone=draft.get("tone"), audience=draft.get("audience"), keywords=draft.get("user_keywords"), adaptive_keywords=st.session_state.selected_adaptive or None, profile_summary=draft.get("profile_summary"))
+                stream_slot = st.empty()
+                with stream_slot:
+                    draft["body"] = st.write_stream(stream_body(draft.get("headline", ""), tone=draft.get("tone"), audience=draft.get("audience"), keywords=draft.get("user_keywords"), adaptive_keywords=st.session_state.selected_adaptive or None, profile_summary=draft.get("profile_summary"))).strip()
+                stream_slot.empty()
             except Exception as e:
                 st.error(f"Body generation error: {e}")
                 draft["body"] = ""
@@ -383,6 +440,7 @@ with tab1:
         edited_body = st.text_area("Generated Body (editable):", value=draft.get("body", "") or "", height=220, key="body_main")
         draft["body"] = edited_body
 
+        profiler.mark("generate_post.adaptive_keywords")
         # Adaptive keywords (generate if missing)
         if "adaptive_keywords" not in draft:
             try:
@@ -405,6 +463,7 @@ with tab1:
                 except Exception as e:
                     st.error(f"Adaptive body generation failed: {e}")
 
+        profiler.mark("generate_post.quick_tools")
         # Regenerate & Refine controls (in-page quick buttons)
         rcol1, rcol2, rcol3 = st.columns(3)
         with rcol1:
@@ -437,6 +496,7 @@ with tab1:
                 except Exception as e:
                     st.error(f"Regenerate CTAs failed: {e}")
 
+        profiler.mark("generate_post.ctas")
         # CTA selection
         if not draft.get("ctas"):
             try:
@@ -447,6 +507,30 @@ with tab1:
         cta_choice = st.radio("Select CTA:", cta_opts, index=0, key="cta_radio")
         draft["cta"] = cta_choice
 
+        profiler.mark("generate_post.hashtags")
+        # Hashtags: the local index is re-ranked when the body changes; the LLM is only
+        # asked on cold start, once per topic/headline
+        if draft.get("hashtag_source") != draft.get("body"):
+            try:
+                draft["local_hashtags"] = generate_hashtags(draft.get("headline", ""), draft.get("body", ""), keywords=draft.get("user_keywords"), use_llm=False)
+            except Exception:
+                draft["local_hashtags"] = []
+            draft["hashtag_source"] = draft.get("body")
+        suggested = list(draft.get("local_hashtags") or [])
+        if len(suggested) < 5:
+            llm_key = (draft.get("topic"), draft.get("headline"))
+            if draft.get("llm_hashtag_key") != llm_key:
+                try:
+                    draft["llm_hashtags"] = generate_hashtags(draft.get("headline", ""), keywords=draft.get("user_keywords"), profile_summary=draft.get("profile_summary"))
+                except Exception:
+                    draft["llm_hashtags"] = []
+                draft["llm_hashtag_key"] = llm_key
+            suggested = merge_hashtags(suggested, draft.get("llm_hashtags") or [], 5)
+        draft["suggested_hashtags"] = suggested
+        if draft.get("suggested_hashtags"):
+            draft["hashtags"] = st.multiselect("Hashtags:", draft["suggested_hashtags"], default=draft["suggested_hashtags"], key="hashtags_select")
+
+        profiler.mark("generate_post.engagement")
         # Engagement score (safe)
         if "predicted_engagement" not in draft:
             try:
@@ -455,11 +539,14 @@ with tab1:
                 draft["predicted_engagement"] = "n/a"
         st.markdown(f"**Predicted Engagement:** {draft.get('predicted_engagement', 'n/a')}")
 
+        profiler.mark("generate_post.preview")
         # Put all together (copy-ready)
         if st.button("📋 Put It All Together"):
             final_text = f"{draft.get('headline','')}\n\n{draft.get('body','')}"
             if draft.get("cta"):
                 final_text = f"{final_text}\n\n{draft.get('cta')}"
+            if draft.get("hashtags"):
+                final_text = f"{final_text}\n\n{' '.join(draft.get('hashtags'))}"
             st.text_area("Final Post (copy & paste ready):", value=final_text, height=280, key="final_post")
 
         # LinkedIn-style preview (always safe)
@@ -475,15 +562,52 @@ with tab1:
             unsafe_allow_html=True,
         )
 
+        profiler.mark("generate_post.images")
+        # Matching images from the local library (existing CLIP index; built only by Re-scan or `python -m src.image_library`)
+        if IMAGE_LIBRARY_DIR and os.path.isdir(IMAGE_LIBRARY_DIR):
+            st.markdown("### 🖼️ Matching Images")
+            if st.button("Re-scan Image Library"):
+                try:
+                    stats = get_library(IMAGE_LIBRARY_DIR).refresh()
+                    st.success(f"Image library updated: {stats['added']} added, {stats['updated']} updated, {stats['removed']} removed.")
+                    draft["image_match_key"] = None  # re-rank against the new index
+                except Exception as e:
+                    st.error(f"Image library scan failed: {e}")
+            match_key = (draft.get("headline"), draft.get("body"))
+            if draft.get("image_match_key") != match_key:
+                try:
+                    draft["image_matches"] = match_images(draft.get("headline", ""), draft.get("body", ""), k=4)
+                except Exception as e:
+                    st.error(f"Image matching failed: {e}")
+                    draft["image_matches"] = []
+                draft["image_match_key"] = match_key
+            matches = draft.get("image_matches", [])
+            if matches:
+                icols = st.columns(len(matches))
+                for col, (path, score) in zip(icols, matches):
+                    with col:
+                        st.image(path, caption=f"{os.path.basename(path)} ({score:.2f})")
+                        if st.button("Use image", key=f"img_{path}"):
+                            draft["image"] = path
+                if draft.get("image"):
+                    st.caption(f"Selected image: {draft['image']}")
+            else:
+                st.info(f"No indexed images match yet. Click \"Re-scan Image Library\" to index {IMAGE_LIBRARY_DIR}.")
+
+        profiler.mark("generate_post.save")
         # Save Post
         if st.button("Save Post"):
             save_post({
                 "topic": draft.get("topic"),
                 "tone": draft.get("tone"),
+                "audience": draft.get("audience"),
                 "headline": draft.get("headline"),
                 "body": draft.get("body"),
+                "user_keywords": draft.get("user_keywords"),
                 "adaptive_keywords": draft.get("adaptive_keywords", []),
                 "cta": draft.get("cta"),
+                "hashtags": draft.get("hashtags", []),
+                "image": draft.get("image"),
                 "predicted_engagement": draft.get("predicted_engagement"),
                 "extracted_tone": draft.get("extracted_tone"),
                 "timestamp": datetime.now().isoformat()
@@ -491,16 +615,21 @@ with tab1:
             st.success("Post saved to history!")
 
 with tab2:
-    history = load_history()
-    if history:
+    profiler.mark("history.posts")
+    history = history_frame()
+    if not history.empty:
         st.subheader("Post History")
-        for p in reversed(history):
-            st.markdown(f"### {p.get('headline','[no headline]')}")
-            st.markdown(p.get("body", ""))
-            st.markdown(f"**CTA:** {p.get('cta','')}")
-            st.markdown(f"**Saved:** {p.get('timestamp','')}")
+        # only one page of posts is rendered per rerun, newest first
+        pages = max((len(history) - 1) // HISTORY_PAGE_SIZE + 1, 1)
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key="history_page")
+        for p in latest_posts(HISTORY_PAGE_SIZE, offset=(page - 1) * HISTORY_PAGE_SIZE, frame=history).itertuples():
+            st.markdown(f"### {p.headline if pd.notna(p.headline) else '[no headline]'}")
+            st.markdown(p.body if pd.notna(p.body) else "")
+            st.markdown(f"**CTA:** {p.cta if pd.notna(p.cta) else ''}")
+            st.markdown(f"**Saved:** {p.timestamp.isoformat() if pd.notna(p.timestamp) else ''}")
             st.markdown("---")
 
+        profiler.mark("history.analytics")
         analytics = get_analytics()
         st.subheader("Analytics")
         st.markdown(f"- Total Posts: {analytics.get('total_posts',0)}")
@@ -510,5 +639,27 @@ with tab2:
         except Exception:
             st.markdown(f"- Avg Engagement: {avg}")
         st.markdown(f"- Tone Distribution: {analytics.get('tone_distribution', {})}")
+
+        acol1, acol2 = st.columns(2)
+        with acol1:
+            st.markdown("**Engagement by Tone**")
+            st.bar_chart(engagement_by("tone", frame=history)["engagement"])
+        with acol2:
+            st.markdown("**Engagement by Audience**")
+            st.bar_chart(engagement_by("audience", frame=history)["engagement"])
+
+        st.markdown("**Weekly Engagement Trend**")
+        st.line_chart(engagement_trend("W", frame=history)[["engagement", "trend"]])
+
+        st.markdown("**Keyword Lift** (mean engagement vs. overall)")
+        lift = keyword_lift(frame=history)
+        if lift.empty:
+            st.info("Not enough keyword usage yet to compute lift.")
+        else:
+            st.dataframe(lift.head(20))
     else:
         st.info("No posts in history yet.")
+
+if PROFILING:
+    profiler.finish_rerun(st.session_state)
+    profiler.render_panel(st.session_state)
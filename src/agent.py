@@ -1,38 +1,79 @@
+import contextlib
+import logging
 import os
 from dotenv import load_dotenv
 from openai import OpenAI
 from src.text_prompt import build_prompt
+from src.hashtags import merge_hashtags, recommend_hashtags
+from src.keywords import extract_keywords
+from src import profiler, storage
 import re
 import json
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+# STUB_LLM=1 swaps OpenAI for a canned local responder (local runs of src.service, no API key needed)
+USE_STUB_LLM = os.getenv("STUB_LLM") == "1"
+client = None if USE_STUB_LLM else OpenAI(api_key=OPENAI_API_KEY)
 
 MODEL_NAME = "gpt-4o-mini"
 
+# Context manager entered around every model request; src.service swaps in one that
+# applies its concurrency and rate limits, so stages that stay local are never throttled
+llm_guard = contextlib.nullcontext
+
+def _stub_completion(prompt: str):
+    subject = prompt.strip().splitlines()[-1][:80] if prompt.strip() else ""
+    return "\n".join(f"{i}. Stub response {i} for: {subject}" for i in range(1, 4))
+
 def _call_openai(prompt: str, temperature=0.7, max_tokens=400):
-    resp = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=temperature,
-        max_tokens=max_tokens
-    )
+    profiler.count("llm_calls")
+    with llm_guard():
+        if USE_STUB_LLM:
+            return _stub_completion(prompt)
+        resp = client.chat.completions.create(
+            model=MODEL_NAME,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
     return resp.choices[0].message.content.strip()
 
+def _stream_openai(prompt: str, temperature=0.7, max_tokens=400):
+    """
+    Yields the completion text in chunks as they arrive.
+    """
+    profiler.count("llm_calls")
+    with llm_guard():
+        if USE_STUB_LLM:
+            for word in _stub_completion(prompt).split(" "):
+                yield word + " "
+            return
+        stream = client.chat.completions.create(
+            model=MODEL_NAME,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
 def generate_headlines(topic, tone=None, profile_summary=None, n_variations=3):
     prompt = build_prompt("headline", topic=topic, tone=tone, profile_summary=profile_summary)
     text = _call_openai(prompt, temperature=0.8, max_tokens=200)
     lines = [l.strip(" -–•0123456789.") .strip() for l in text.split("\n") if l.strip()]
     return lines[:n_variations] if lines else [text]
 
-def generate_body(headline, tone=None, audience=None, keywords=None, adaptive_keywords=None, profile_summary=None):
+def _body_prompt(headline, tone=None, audience=None, keywords=None, adaptive_keywords=None, profile_summary=None):
     combined_keywords = ""
     if keywords:
         combined_keywords += keywords
     if adaptive_keywords:
         combined_keywords += ", " + ", ".join(adaptive_keywords)
-    prompt = build_prompt(
+    return build_prompt(
         "body",
         headline=headline,
         tone=tone,
@@ -40,18 +81,51 @@ def generate_body(headline, tone=None, audience=None, keywords=None, adaptive_ke
         keywords=combined_keywords if combined_keywords else None,
         profile_summary=profile_summary
     )
+
+def generate_body(headline, tone=None, audience=None, keywords=None, adaptive_keywords=None, profile_summary=None):
+    prompt = _body_prompt(headline, tone, audience, keywords, adaptive_keywords, profile_summary)
     return _call_openai(prompt, temperature=0.75, max_tokens=500)
 
+def stream_body(headline, tone=None, audience=None, keywords=None, adaptive_keywords=None, profile_summary=None):
+    """
+    Same as generate_body, but yields the body text in chunks as it is generated.
+    """
+    prompt = _body_prompt(headline, tone, audience, keywords, adaptive_keywords, profile_summary)
+    yield from _stream_openai(prompt, temperature=0.75, max_tokens=500)
+
 def generate_ctas(topic, profile_summary=None):
     prompt = build_prompt("cta", topic=topic, profile_summary=profile_summary)
     text = _call_openai(prompt, temperature=0.7, max_tokens=150)
     lines = [l.strip("-•0123456789. ") for l in text.split("\n") if l.strip()]
     return lines[:3] if lines else [text]
 
+def generate_hashtags(headline, body=None, keywords=None, profile_summary=None, n=5, use_llm=True):
+    """
+    Recommends hashtags from the local co-occurrence index over saved posts.
+    Only asks the LLM when the history does not have enough hashtags yet (cold start)
+    and use_llm is set.
+    """
+    try:
+        tags = recommend_hashtags(headline, body, keywords=keywords, n=n)
+    except Exception:
+        logger.warning("Local hashtag ranking failed; falling back to the LLM", exc_info=True)
+        tags = []
+    if len(tags) >= n or not use_llm:
+        return tags
+    return merge_hashtags(tags, generate_llm_hashtags(headline, profile_summary=profile_summary), n)
+
+def generate_llm_hashtags(headline, profile_summary=None):
+    """
+    Asks the model for hashtags (with '#'); the cold-start half of generate_hashtags.
+    """
+    prompt = build_prompt("hashtags", headline=headline, profile_summary=profile_summary)
+    text = _call_openai(prompt, temperature=0.5, max_tokens=80)
+    return re.findall(r"#\w[\w-]*", text)
+
 def generate_engagement_score(headline, body, audience=None, profile_summary=None):
     prompt = build_prompt("engagement", headline=headline, keywords=body, audience=audience, topic=headline, profile_summary=profile_summary)
     resp = _call_openai(prompt, temperature=0.3, max_tokens=80)
-    m = re.search(r"([1-9]|10)", resp)
+    m = re.search(storage.ENGAGEMENT_PATTERN, resp)  # same pattern analytics parse the saved score with
     score = m.group(0) if m else resp
     return str(score) + " — " + resp
 
@@ -74,11 +148,22 @@ def extract_tone_from_profile(profile_summary):
     except Exception:
         return {"tone_summary": resp}
 
-def generate_adaptive_keywords(topic, profile_summary=None, n=10):
+def generate_adaptive_keywords(topic, profile_summary=None, n=10, use_llm=False):
     """
     Generates strong adaptive keywords that are different from user keywords
     for natural incorporation into the post body.
+    Extracted locally by default (see src.keywords); use_llm=True asks the model instead,
+    and the model is also used if local extraction is unavailable.
     """
+    if not use_llm:
+        try:
+            local = extract_keywords(topic, profile_summary=profile_summary, n=n)
+        except Exception:
+            logger.warning("Local keyword extraction failed; falling back to the LLM", exc_info=True)
+            local = []
+        if local:
+            return local
+
     # Use the valid "keywords" stage
     prompt = build_prompt("keywords", topic=topic, profile_summary=profile_summary)
     text = _call_openai(prompt, temperature=0.6, max_tokens=150)
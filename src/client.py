@@ -0,0 +1,84 @@
+"""
+Thin HTTP client for src.service. Mirrors the src.agent functions used by app.py
+so the UI can switch between in-process generation and the remote service.
+
+Hashtag ranking and keyword extraction stay on this host: they learn from
+post_history.json, which save_post writes here, so only their LLM fallbacks go
+to the service.
+"""
+import logging
+import os
+
+import httpx
+
+from src import profiler
+from src.hashtags import merge_hashtags, recommend_hashtags
+from src.keywords import extract_keywords
+
+logger = logging.getLogger(__name__)
+
+SERVICE_URL = os.getenv("AGENT_SERVICE_URL", "http://localhost:8000")
+TIMEOUT = float(os.getenv("AGENT_SERVICE_TIMEOUT", "60"))
+
+_http = httpx.Client(base_url=SERVICE_URL, timeout=TIMEOUT)
+
+def _call_stage(stage, **kwargs):
+    profiler.count("service_calls")
+    resp = _http.post(f"/stages/{stage}", json=kwargs)
+    resp.raise_for_status()
+    return resp.json()["result"]
+
+def _stream_stage(stage, **kwargs):
+    profiler.count("service_calls")
+    with _http.stream("POST", f"/stages/{stage}/stream", json=kwargs) as resp:
+        resp.raise_for_status()
+        for chunk in resp.iter_text():
+            if chunk:
+                yield chunk
+
+def generate_headlines(topic, tone=None, profile_summary=None, n_variations=3):
+    return _call_stage("headlines", topic=topic, tone=tone, profile_summary=profile_summary, n_variations=n_variations)
+
+def generate_body(headline, tone=None, audience=None, keywords=None, adaptive_keywords=None, profile_summary=None):
+    return _call_stage("body", headline=headline, tone=tone, audience=audience, keywords=keywords,
+                       adaptive_keywords=adaptive_keywords, profile_summary=profile_summary)
+
+def stream_body(headline, tone=None, audience=None, keywords=None, adaptive_keywords=None, profile_summary=None):
+    yield from _stream_stage("body", headline=headline, tone=tone, audience=audience, keywords=keywords,
+                             adaptive_keywords=adaptive_keywords, profile_summary=profile_summary)
+
+def generate_ctas(topic, profile_summary=None):
+    return _call_stage("ctas", topic=topic, profile_summary=profile_summary)
+
+def generate_hashtags(headline, body=None, keywords=None, profile_summary=None, n=5, use_llm=True):
+    try:
+        tags = recommend_hashtags(headline, body, keywords=keywords, n=n)
+    except Exception:
+        logger.warning("Local hashtag ranking failed; falling back to the LLM", exc_info=True)
+        tags = []
+    if len(tags) >= n or not use_llm:
+        return tags
+    return merge_hashtags(tags, _call_stage("hashtags_llm", headline=headline, profile_summary=profile_summary), n)
+
+def generate_engagement_score(headline, body, audience=None, profile_summary=None):
+    return _call_stage("engagement", headline=headline, body=body, audience=audience, profile_summary=profile_summary)
+
+def refine_post(refinement_input, draft, mode=None):
+    return _call_stage("refine", refinement_input=refinement_input, draft=draft, mode=mode)
+
+def extract_tone_from_profile(profile_summary):
+    return _call_stage("extract_tone", profile_summary=profile_summary)
+
+def generate_adaptive_keywords(topic, profile_summary=None, n=10, use_llm=False):
+    if not use_llm:
+        try:
+            local = extract_keywords(topic, profile_summary=profile_summary, n=n)
+        except Exception:
+            logger.warning("Local keyword extraction failed; falling back to the LLM", exc_info=True)
+            local = []
+        if local:
+            return local
+    return _call_stage("keywords", topic=topic, profile_summary=profile_summary, n=n, use_llm=True)
+
+def conversational_followup(draft):
+    return _call_stage("followup", draft=draft)
@@ -0,0 +1,272 @@
+"""
+Local hashtag recommender built from saved posts.
+
+Keeps a sparse keyword/hashtag co-occurrence matrix and, per hashtag, the
+centroid of the MiniLM embeddings of the posts that used it. A draft is ranked
+against the centroids with one matrix-vector product, boosted by how often the
+draft's keywords co-occurred with each hashtag.
+
+storage.save_post adds the new post incrementally when the index is already
+loaded and in sync; otherwise the index is only marked stale and rebuilt by the
+next recommend_hashtags() (or offline with `python -m src.hashtags`).
+"""
+import json
+import logging
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from src import profiler, storage
+
+logger = logging.getLogger(__name__)
+
+HASHTAG_INDEX_FILE = "hashtag_index.npz"
+EMBEDDING_DIM = 384
+COOCCURRENCE_WEIGHT = 0.3
+
+HASHTAG_PATTERN = re.compile(r"#(\w[\w-]*)")
+
+_lock = threading.Lock()
+_state = {"index": None}
+
+
+def _embed(texts):
+    from src.text_encoder import get_text_embeddings
+    return np.asarray(get_text_embeddings(texts), dtype=np.float32).reshape(len(texts), EMBEDDING_DIM)
+
+
+def _text(value):
+    return value if isinstance(value, str) else ""
+
+
+def _post_text(headline, body):
+    return f"{_text(headline)}\n{_text(body)}".strip()
+
+
+def extract_hashtags(text):
+    """
+    Returns the hashtags written inline in a post (lowercased, without '#').
+    """
+    return [h.lower() for h in HASHTAG_PATTERN.findall(_text(text))]
+
+
+class HashtagIndex:
+    def __init__(self):
+        self.tags = []
+        self.tag_ids = {}
+        # row buffers grown geometrically; rows past len(tags) are spare capacity
+        self._sums = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        self._counts = np.zeros(0, dtype=np.int64)
+        self.cooccurrence = defaultdict(Counter)  # keyword -> Counter(hashtag -> posts)
+        self.keyword_counts = Counter()
+        self.n_posts = 0
+        self.stamp = None
+        self._centroids = None
+
+    @property
+    def sums(self):
+        return self._sums[:len(self.tags)]
+
+    @property
+    def counts(self):
+        return self._counts[:len(self.tags)]
+
+    def _tag_id(self, tag):
+        if tag not in self.tag_ids:
+            if len(self.tags) == len(self._sums):
+                capacity = max(16, 2 * len(self._sums))
+                sums = np.zeros((capacity, EMBEDDING_DIM), dtype=np.float32)
+                sums[:len(self.tags)] = self.sums
+                counts = np.zeros(capacity, dtype=np.int64)
+                counts[:len(self.tags)] = self.counts
+                self._sums, self._counts = sums, counts
+            self.tag_ids[tag] = len(self.tags)
+            self.tags.append(tag)
+        return self.tag_ids[tag]
+
+    def add(self, hashtags, keywords, embedding):
+        """
+        Adds one saved post. hashtags/keywords are normalized lists, embedding is normalized.
+        """
+        self.n_posts += 1
+        hashtags = list(dict.fromkeys(hashtags))
+        if not hashtags:
+            return
+        for tag in hashtags:
+            i = self._tag_id(tag)
+            self._sums[i] += embedding
+            self._counts[i] += 1
+        for kw in keywords:
+            self.keyword_counts[kw] += 1
+            self.cooccurrence[kw].update(hashtags)
+        self._centroids = None
+
+    def centroids(self):
+        if self._centroids is None:
+            norms = np.linalg.norm(self.sums, axis=1, keepdims=True)
+            self._centroids = self.sums / np.maximum(norms, 1e-12)
+        return self._centroids
+
+    def rank(self, embedding, keywords=None, n=5):
+        """
+        Returns [(hashtag, score)] best first.
+        """
+        if not self.tags:
+            return []
+        scores = self.centroids() @ embedding
+        for kw in keywords or []:
+            seen = self.keyword_counts.get(kw)
+            if not seen:
+                continue
+            for tag, together in self.cooccurrence[kw].items():
+                scores[self.tag_ids[tag]] += COOCCURRENCE_WEIGHT * together / seen
+        top = np.argsort(-scores)[:n]
+        return [(self.tags[i], float(scores[i])) for i in top]
+
+    def save(self, path):
+        meta = {
+            "n_posts": self.n_posts,
+            "stamp": self.stamp,
+            "cooccurrence": self.cooccurrence,
+            "keyword_counts": self.keyword_counts,
+        }
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, tags=np.array(self.tags, dtype=str), sums=self.sums,
+                 counts=self.counts, meta=np.array(json.dumps(meta)))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        profiler.count("storage_bytes", os.path.getsize(path))
+        with np.load(path) as data:
+            index = cls()
+            index.tags = [str(t) for t in data["tags"]]
+            index.tag_ids = {t: i for i, t in enumerate(index.tags)}
+            index._sums = data["sums"].astype(np.float32).reshape(-1, EMBEDDING_DIM)
+            index._counts = data["counts"].astype(np.int64)
+            meta = json.loads(str(data["meta"]))
+        index.n_posts = meta["n_posts"]
+        index.stamp = meta["stamp"]
+        index.cooccurrence = defaultdict(Counter, {k: Counter(v) for k, v in meta["cooccurrence"].items()})
+        index.keyword_counts = Counter(meta["keyword_counts"])
+        return index
+
+
+def _as_list(value):
+    # list cells of the Arrow-backed history frame come back as lists or pd.NA
+    return list(value) if isinstance(value, (list, tuple, np.ndarray)) else []
+
+
+def _row_hashtags(hashtags, body):
+    return _as_list(hashtags) + extract_hashtags(body)
+
+
+def build_index():
+    """
+    Rebuilds the index from the full post history (embeddings computed in one batch).
+    """
+    frame = storage.history_frame()
+    index = HashtagIndex()
+    index.stamp = storage.source_stamp()
+    if frame.empty:
+        return index
+    texts = [_post_text(h, b) for h, b in zip(frame["headline"], frame["body"])]
+    tagged = [_row_hashtags(h, b) for h, b in zip(frame["hashtags"], frame["body"])]
+    rows = [i for i, tags in enumerate(tagged) if tags]
+    embeddings = _embed([texts[i] for i in rows]) if rows else None
+    embedding_of = {row: embeddings[j] for j, row in enumerate(rows)}
+    for i, (tags, keywords) in enumerate(zip(tagged, frame["keywords"])):
+        index.add(tags, _as_list(keywords), embedding_of.get(i))
+    return index
+
+
+def _current_index():
+    """
+    Returns the in-memory index, loading or rebuilding it when the history moved on.
+    Caller must hold _lock.
+    """
+    stamp = storage.source_stamp()
+    index = _state["index"]
+    if index is not None and index.stamp == stamp:
+        return index
+    if os.path.exists(HASHTAG_INDEX_FILE):
+        try:
+            index = HashtagIndex.load(HASHTAG_INDEX_FILE)
+        except Exception:
+            logger.warning("Ignoring unreadable %s", HASHTAG_INDEX_FILE, exc_info=True)
+            index = None
+    if index is None or index.stamp != stamp:
+        index = build_index()
+        _persist(index)
+    _state["index"] = index
+    return index
+
+
+def _persist(index):
+    try:
+        index.save(HASHTAG_INDEX_FILE)
+    except OSError:
+        logger.warning("Could not write %s", HASHTAG_INDEX_FILE, exc_info=True)
+
+
+def index_post(entry, previous_stamp=None):
+    """
+    Called by storage.save_post. Adds the just-saved post when the index is loaded
+    in this process and was in sync before the save; otherwise just drops the
+    in-memory index so the next recommend_hashtags() rebuilds it from the history.
+    """
+    with _lock:
+        index = _state["index"]
+        if index is None:
+            return  # the stamp on disk no longer matches, so it is rebuilt when first needed
+        if previous_stamp is None or index.stamp != previous_stamp:
+            _state["index"] = None
+            return
+        body = entry.get("body")
+        saved = [h.lstrip("#") for h in storage.normalize_keywords(entry.get("hashtags"))]
+        tags = _row_hashtags(saved, body)
+        keywords = storage.normalize_keywords(entry.get("user_keywords"), entry.get("adaptive_keywords"))
+        embedding = _embed([_post_text(entry.get("headline"), body)])[0] if tags else None
+        index.add(tags, keywords, embedding)
+        index.stamp = storage.source_stamp()
+        _persist(index)
+
+
+def merge_hashtags(tags, extra, n=5):
+    """
+    Appends the hashtags in extra that tags does not have yet (case-insensitive), up to n.
+    """
+    out = list(tags)
+    for tag in extra:
+        if len(out) >= n:
+            break
+        if tag.lower() not in (t.lower() for t in out):
+            out.append(tag)
+    return out[:n]
+
+
+def recommend_hashtags(headline, body, keywords=None, n=5):
+    """
+    Ranks known hashtags for a draft. Returns up to n hashtags with '#', best first;
+    an empty list means the history has no hashtags to learn from yet.
+    """
+    with _lock:
+        index = _current_index()
+        if not index.tags:
+            return []
+    embedding = _embed([_post_text(headline, body)])[0]
+    keywords = storage.normalize_keywords(keywords)
+    # index_post mutates the index in place, so rank while holding the lock
+    with _lock:
+        return ["#" + tag for tag, _ in index.rank(embedding, keywords, n=n)]
+
+
+if __name__ == "__main__":
+    # offline rebuild, e.g. after importing history from elsewhere
+    with _lock:
+        _state["index"] = build_index()
+        _persist(_state["index"])
+    print(f"Indexed {_state['index'].n_posts} posts, {len(_state['index'].tags)} hashtags -> {HASHTAG_INDEX_FILE}")
@@ -1,9 +1,18 @@
+import numpy as np
 import torch
 import clip
 from PIL import Image
+from src.quantization import configure_threads, quantize, use_int8
+
+MODEL_NAME = "ViT-B/32"
+EMBEDDING_DIM = 512
 
 device = "cuda" if torch.cuda.is_available() else "cpu"
-model, preprocess = clip.load("ViT-B/32", device=device)
+configure_threads()
+model, preprocess = clip.load(MODEL_NAME, device=device)
+if use_int8(device):
+    # EMBEDDING_BACKEND=int8: dynamically quantized Linear layers (see src.quantization)
+    model = quantize(model)
 
 def get_image_embedding(image_path: str):
     """
@@ -15,3 +24,26 @@ def get_image_embedding(image_path: str):
     # Normalize
     embedding = embedding / embedding.norm(dim=-1, keepdim=True)
     return embedding
+
+def get_image_embeddings(image_paths, batch_size=32):
+    """
+    Returns an (n, 512) float32 numpy matrix of normalized CLIP embeddings for a list of images.
+    """
+    out = []
+    for i in range(0, len(image_paths), batch_size):
+        batch = torch.stack([preprocess(Image.open(p).convert("RGB")) for p in image_paths[i:i + batch_size]]).to(device)
+        with torch.no_grad():
+            embedding = model.encode_image(batch).float()
+        out.append((embedding / embedding.norm(dim=-1, keepdim=True)).cpu().numpy())
+    return np.concatenate(out) if out else np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+
+def get_clip_text_embedding(text: str):
+    """
+    Returns a normalized CLIP text embedding (same space as the image embeddings) as a numpy vector.
+    Text longer than CLIP's 77-token context is truncated.
+    """
+    tokens = clip.tokenize([text], truncate=True).to(device)
+    with torch.no_grad():
+        embedding = model.encode_text(tokens).float()
+    embedding = embedding / embedding.norm(dim=-1, keepdim=True)
+    return embedding[0].cpu().numpy()
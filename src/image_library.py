@@ -0,0 +1,247 @@
+"""
+CLIP index over a local folder of images, for matching images to post drafts.
+
+The folder is encoded once into <folder>/.clip_index/embeddings.npy (one
+normalized CLIP row per image, opened memory-mapped) plus a manifest with each
+file's mtime, size and hash. refresh() only re-encodes files whose content
+changed; ranking a draft is a single matrix-vector product over the mapped
+matrix, so no image is re-encoded per request.
+
+Matching only reads the existing index. Build or update it from the app's
+"Re-scan Image Library" button or offline:
+    python -m src.image_library [folder]
+"""
+import hashlib
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+
+IMAGE_LIBRARY_DIR = os.getenv("IMAGE_LIBRARY_DIR", os.path.join("data", "images"))
+INDEX_DIRNAME = ".clip_index"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif")
+ENCODE_BATCH = 32
+
+_libraries = {}
+_libraries_lock = threading.Lock()
+
+
+def _file_hash(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class ImageLibrary:
+    def __init__(self, folder):
+        self.folder = folder
+        self.index_dir = os.path.join(folder, INDEX_DIRNAME)
+        self.matrix_path = os.path.join(self.index_dir, "embeddings.npy")
+        self.manifest_path = os.path.join(self.index_dir, "manifest.json")
+        self.lock = threading.Lock()
+        self.entries = {}  # relative path -> {"row", "mtime_ns", "size", "sha1"}; row -1 = unreadable
+        self.paths = []  # row -> relative path
+        self.matrix = None
+        self.manifest_mtime = None
+        self._load()
+
+    def _manifest_stamp(self):
+        try:
+            return os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self):
+        self.manifest_mtime = self._manifest_stamp()
+        if not (os.path.exists(self.manifest_path) and os.path.exists(self.matrix_path)):
+            return
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+            self.matrix = np.load(self.matrix_path, mmap_mode="r")
+        except Exception:
+            self.entries, self.matrix = {}, None
+            return
+        self.paths = [None] * len(self.matrix)
+        for rel, e in self.entries.items():
+            if 0 <= e["row"] < len(self.paths):
+                self.paths[e["row"]] = rel
+
+    def reload_if_changed(self):
+        """
+        Picks up an index rebuilt by another process (e.g. the offline command).
+        """
+        if self.manifest_mtime == self._manifest_stamp():
+            return
+        with self.lock:
+            if self.manifest_mtime != self._manifest_stamp():
+                self.entries, self.paths, self.matrix = {}, [], None
+                self._load()
+
+    def _scan(self):
+        found = {}
+        for root, dirs, files in os.walk(self.folder):
+            dirs[:] = [d for d in dirs if d != INDEX_DIRNAME]
+            for name in files:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    found[os.path.relpath(path, self.folder)] = os.stat(path)
+        return found
+
+    def _encode(self, rels):
+        """
+        Encodes images in batches; a batch that fails is retried file by file so
+        one unreadable image does not block the rest. Returns {rel: vector}.
+        """
+        from src.image_encoder import get_image_embeddings
+
+        out = {}
+        for i in range(0, len(rels), ENCODE_BATCH):
+            batch = rels[i:i + ENCODE_BATCH]
+            paths = [os.path.join(self.folder, r) for r in batch]
+            try:
+                out.update(zip(batch, get_image_embeddings(paths)))
+            except Exception:
+                for rel, path in zip(batch, paths):
+                    try:
+                        out[rel] = get_image_embeddings([path])[0]
+                    except Exception:
+                        pass
+        return out
+
+    def refresh(self):
+        """
+        Brings the index in line with the folder. Returns counts of added/updated/removed/unchanged files.
+        """
+        with self.lock:
+            found = self._scan()
+            by_hash = {e["sha1"]: e["row"] for e in self.entries.values() if e["row"] >= 0}
+            entries, reuse, to_encode = {}, {}, []
+            stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+            for rel, st in found.items():
+                old = self.entries.get(rel)
+                meta = {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+                if old and old["mtime_ns"] == st.st_mtime_ns and old["size"] == st.st_size:
+                    entries[rel] = old
+                    if old["row"] >= 0:
+                        reuse[rel] = old["row"]
+                    stats["unchanged"] += 1
+                    continue
+                try:
+                    digest = _file_hash(os.path.join(self.folder, rel))
+                except OSError:
+                    continue
+                entries[rel] = dict(meta, sha1=digest, row=-1)
+                if digest in by_hash:
+                    # touched, renamed or copied file with content we already encoded
+                    reuse[rel] = by_hash[digest]
+                    stats["unchanged"] += 1
+                else:
+                    to_encode.append(rel)
+                    stats["updated" if old else "added"] += 1
+            stats["removed"] = len(set(self.entries) - set(found))
+
+            if not to_encode and not stats["removed"] and entries == self.entries:
+                return stats
+
+            encoded = self._encode(to_encode)
+            rows = list(reuse.items()) + list(encoded.items())
+            if self.matrix is not None and reuse:
+                kept = np.asarray(self.matrix[[row for _, row in reuse.items()]], dtype=np.float32)
+            else:
+                kept = np.zeros((0, 0), dtype=np.float32)
+            vectors = [kept] if len(kept) else []
+            if encoded:
+                vectors.append(np.stack(list(encoded.values())).astype(np.float32))
+            for i, (rel, _) in enumerate(rows):
+                entries[rel] = dict(entries[rel], row=i)
+            self._write(np.concatenate(vectors) if vectors else None, entries)
+            return stats
+
+    def _write(self, matrix, entries):
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.matrix = None  # release the old mapping before replacing the file
+        if matrix is not None:
+            tmp = self.matrix_path + ".tmp.npy"
+            out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=matrix.shape)
+            out[:] = matrix
+            out.flush()
+            del out
+            os.replace(tmp, self.matrix_path)
+        elif os.path.exists(self.matrix_path):
+            os.remove(self.matrix_path)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        os.replace(tmp, self.manifest_path)
+        self.entries = {}
+        self.paths = []
+        self._load()
+        if self.matrix is None:
+            self.entries = entries
+
+    def __len__(self):
+        return 0 if self.matrix is None else len(self.matrix)
+
+    def search(self, headline, body=None, k=6):
+        """
+        Returns [(image path, score)] for the k images closest to the draft, best first.
+        """
+        matrix, paths = self.matrix, self.paths
+        if matrix is None or not len(matrix) or len(paths) != len(matrix):
+            return []
+        from src.image_encoder import get_clip_text_embedding
+
+        query = get_clip_text_embedding(headline or "")
+        if body:
+            query = query + get_clip_text_embedding(body)
+        query = (query / np.linalg.norm(query)).astype(np.float32)
+        scores = matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(os.path.join(self.folder, paths[i]), float(scores[i])) for i in top if paths[i]]
+
+
+def get_library(folder=IMAGE_LIBRARY_DIR, refresh=False):
+    """
+    Returns the library for folder, opened on whatever index is already on disk.
+    With refresh=True the index is brought up to date first; a library whose first
+    refresh fails is not kept, so the next call starts over.
+    """
+    with _libraries_lock:
+        library = _libraries.get(folder)
+    if library is None:
+        library = ImageLibrary(folder)
+        if refresh:
+            library.refresh()
+            refresh = False
+        with _libraries_lock:
+            library = _libraries.setdefault(folder, library)
+    else:
+        library.reload_if_changed()
+    if refresh:
+        library.refresh()
+    return library
+
+
+def match_images(headline, body=None, k=6, folder=IMAGE_LIBRARY_DIR):
+    """
+    Ranks the already-indexed images in the library folder against a draft
+    headline/body. Never scans or encodes the folder; returns [] until it is indexed.
+    """
+    if not os.path.isdir(folder):
+        return []
+    return get_library(folder).search(headline, body, k=k)
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else IMAGE_LIBRARY_DIR
+    library = ImageLibrary(target)
+    stats = library.refresh()
+    print(f"{target}: {len(library)} images indexed ({stats['added']} added, {stats['updated']} updated, "
+          f"{stats['removed']} removed, {stats['unchanged']} unchanged)")
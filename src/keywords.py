@@ -0,0 +1,130 @@
+"""
+Local keyword extraction: n-gram candidates from the topic, profile and post
+history, ranked by MiniLM similarity to the topic and diversified with MMR.
+Runs on CPU without an LLM call; candidate embeddings are cached per process.
+"""
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+from src import storage
+
+MAX_NGRAM = 3
+MAX_HISTORY_CANDIDATES = 200
+MAX_PROFILE_CANDIDATES = 100
+MMR_LAMBDA = 0.6
+EMBEDDING_CACHE_SIZE = 50000
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9+#'&-]*")
+STOPWORDS = set("""
+a about above after again against all am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her
+here hers herself him himself his how i if in into is it its itself just let me more most my myself no nor
+not now of off on once only or other our ours ourselves out over own same she should so some such than that
+the their theirs them themselves then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your yours yourself yourselves also am
+i'm i've we're it's really get got make made like many much new one two use using via within without
+""".split())
+
+_lock = threading.Lock()
+_embedding_cache = {}
+
+
+def _embed(phrases):
+    """
+    Returns normalized embeddings for phrases, encoding only the ones not seen before.
+    """
+    from src.text_encoder import get_text_embeddings
+    with _lock:
+        cached = {p: _embedding_cache[p] for p in phrases if p in _embedding_cache}
+    missing = [p for p in dict.fromkeys(phrases) if p not in cached]
+    if missing:
+        vectors = np.asarray(get_text_embeddings(missing), dtype=np.float32)
+        cached.update(zip(missing, vectors))
+        with _lock:
+            if len(_embedding_cache) + len(missing) > EMBEDDING_CACHE_SIZE:
+                _embedding_cache.clear()
+            _embedding_cache.update(zip(missing, vectors))
+    return np.stack([cached[p] for p in phrases])
+
+
+def ngram_candidates(text, max_n=MAX_NGRAM):
+    """
+    Returns n-grams (1..max_n words) that neither start nor end with a stopword.
+    """
+    out = []
+    for sentence in re.split(r"[.!?;:,\n()\[\]\"]+", text or ""):
+        tokens = TOKEN_PATTERN.findall(sentence)
+        for n in range(1, max_n + 1):
+            for i in range(len(tokens) - n + 1):
+                gram = tokens[i:i + n]
+                if gram[0].lower() in STOPWORDS or gram[-1].lower() in STOPWORDS:
+                    continue
+                if n == 1 and len(gram[0]) < 3 and not gram[0].isupper():
+                    continue
+                out.append(" ".join(gram))
+    return out
+
+
+def _profile_candidates(profile_summary, limit=MAX_PROFILE_CANDIDATES):
+    """
+    The most frequent n-grams of the profile, so a long pasted profile does not
+    turn into thousands of phrases to embed.
+    """
+    counts = Counter(ngram_candidates(profile_summary))
+    return [gram for gram, _ in counts.most_common(limit)]
+
+
+def _history_candidates(limit=MAX_HISTORY_CANDIDATES):
+    frame = storage.history_frame()
+    if frame.empty:
+        return []
+    counts = storage.keyword_frame(frame)["keyword"].value_counts()
+    return list(counts.index[:limit])
+
+
+def _dedupe(candidates, exclude=()):
+    seen = {e.lower() for e in exclude}
+    out = []
+    for c in candidates:
+        if c.lower() not in seen:
+            seen.add(c.lower())
+            out.append(c)
+    return out
+
+
+def mmr(query, vectors, k, lambda_=MMR_LAMBDA):
+    """
+    Maximal marginal relevance over normalized vectors. Returns selected row indices.
+    """
+    relevance = vectors @ query
+    redundancy = None
+    selected = []
+    for _ in range(min(k, len(vectors))):
+        scores = relevance if redundancy is None else lambda_ * relevance - (1 - lambda_) * redundancy
+        scores = scores.copy()
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        similarity = vectors @ vectors[best]
+        redundancy = similarity if redundancy is None else np.maximum(redundancy, similarity)
+    return selected
+
+
+def extract_keywords(topic, profile_summary=None, n=10, use_history=True):
+    """
+    Returns up to n keywords related to the topic, most relevant first.
+    """
+    if not topic or not topic.strip():
+        return []
+    candidates = ngram_candidates(topic) + _profile_candidates(profile_summary)
+    if use_history:
+        candidates += _history_candidates()
+    candidates = _dedupe(candidates, exclude=[topic.strip()])
+    if not candidates:
+        return []
+    query = _embed([topic.strip()])[0]
+    vectors = _embed(candidates)
+    return [candidates[i] for i in mmr(query, vectors, n)]
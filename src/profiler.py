@@ -0,0 +1,205 @@
+"""
+Opt-in profiler for Streamlit reruns of app.py.
+
+Enable with PROFILE_RERUNS=1, or set PROFILE_ALLOW_QUERY=1 to let a session
+turn it on by opening the app with ?profile=1. Each rerun is split into named
+sections by profiler.mark(); for each section it records wall time, LLM calls,
+service calls and bytes read from storage, and for the whole rerun the
+session_state size plus a cProfile dump in PROFILE_DIR. Only the newest MAX_RUNS
+dumps are kept on disk.
+
+Counters are bumped from anywhere via profiler.count(); it is a no-op when no
+rerun is being profiled on the current thread (e.g. inside src.service).
+"""
+import cProfile
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import Counter
+
+ENABLED = os.getenv("PROFILE_RERUNS") == "1"
+ALLOW_QUERY = os.getenv("PROFILE_ALLOW_QUERY") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+MAX_RUNS = 50
+
+STATE_KEY = "_profiler_runs"
+OPEN_KEY = "_profiler_open"
+
+_local = threading.local()
+
+
+class RerunProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.started_at = time.strftime("%H:%M:%S")
+        self.last_activity = self.started
+        self.counters = Counter()
+        self.sections = []
+        self.section_name = "startup"
+        self.section_start = self.started
+        self.section_counters = Counter()
+        self.state_bytes = 0
+        self.interrupted = False
+        self.finished = False
+        self.dump_path = None
+        self.cprofile = cProfile.Profile()
+
+    def close_section(self):
+        now = time.perf_counter()
+        delta = self.counters - self.section_counters
+        self.sections.append({
+            "section": self.section_name,
+            "ms": round((now - self.section_start) * 1000, 1),
+            "llm_calls": delta["llm_calls"],
+            "service_calls": delta["service_calls"],
+            "storage_bytes": delta["storage_bytes"],
+        })
+        self.section_start = now
+        self.section_counters = Counter(self.counters)
+        self.last_activity = now
+
+    def summary(self):
+        return {
+            "started": self.started_at,
+            "ms": round((self.last_activity - self.started) * 1000, 1),
+            "llm_calls": self.counters["llm_calls"],
+            "service_calls": self.counters["service_calls"],
+            "storage_bytes": self.counters["storage_bytes"],
+            "state_bytes": self.state_bytes,
+            "interrupted": self.interrupted,
+        }
+
+
+def is_enabled(query_params=None):
+    if ENABLED:
+        return True
+    if not ALLOW_QUERY:
+        return False
+    try:
+        return query_params is not None and query_params.get("profile") == "1"
+    except Exception:
+        return False
+
+
+def count(name, n=1):
+    """
+    Adds n to a counter of the rerun being profiled on this thread.
+    """
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run.counters[name] += n
+
+
+def mark(name):
+    """
+    Ends the current section and starts a new one called name.
+    """
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run.close_section()
+        run.section_name = name
+
+
+def _state_size(session_state):
+    total = 0
+    for key in list(session_state.keys()):
+        if key in (STATE_KEY, OPEN_KEY):
+            continue
+        value = session_state[key]
+        try:
+            total += len(pickle.dumps(value))
+        except Exception:
+            total += sys.getsizeof(value)
+    return total
+
+
+def _prune_dumps():
+    """
+    Deletes all but the newest MAX_RUNS dumps in PROFILE_DIR (shared by every session).
+    """
+    try:
+        dumps = [os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR) if name.endswith(".pstats")]
+        dumps.sort(key=os.path.getmtime)
+    except OSError:
+        return
+    for path in dumps[:-MAX_RUNS]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _finalize(run, session_state, interrupted=False):
+    run.finished = True
+    run.close_section()
+    run.interrupted = interrupted
+    run.state_bytes = _state_size(session_state)
+    if run.cprofile is not None:
+        run.cprofile.disable()
+        try:
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            run.dump_path = os.path.join(PROFILE_DIR, f"rerun-{time.strftime('%Y%m%d-%H%M%S')}-{id(run):x}.pstats")
+            run.cprofile.dump_stats(run.dump_path)
+        except OSError:
+            run.dump_path = None
+        run.cprofile = None  # keep session_state small
+        _prune_dumps()
+    runs = session_state.get(STATE_KEY, [])
+    runs.append(run)
+    session_state[STATE_KEY] = runs[-MAX_RUNS:]
+
+
+def start_rerun(session_state):
+    """
+    Starts profiling this rerun. A rerun cut short by st.rerun() (or a widget event)
+    is closed here; the next run starts right away, so its timing stays accurate.
+    """
+    previous = session_state.get(OPEN_KEY)
+    if previous is not None and not previous.finished:
+        _finalize(previous, session_state, interrupted=True)
+    run = RerunProfile()
+    session_state[OPEN_KEY] = run
+    _local.run = run
+    try:
+        run.cprofile.enable()
+    except ValueError:
+        # another session's rerun holds the interpreter-wide profiler (Python 3.12+)
+        run.cprofile = None
+    return run
+
+
+def finish_rerun(session_state):
+    run = getattr(_local, "run", None)
+    if run is None:
+        return None
+    _local.run = None
+    session_state[OPEN_KEY] = None
+    _finalize(run, session_state)
+    return run
+
+
+def render_panel(session_state):
+    """
+    Debug panel in the sidebar: per-section breakdown of the latest rerun and recent rerun totals.
+    """
+    import streamlit as st
+
+    runs = session_state.get(STATE_KEY, [])
+    with st.sidebar.expander("Rerun profiler", expanded=False):
+        if not runs:
+            st.caption("No reruns profiled yet.")
+            return
+        latest = runs[-1]
+        st.markdown(f"**Latest rerun:** {latest.summary()['ms']} ms, "
+                    f"{latest.counters['llm_calls']} LLM calls, "
+                    f"{latest.counters['storage_bytes']:,} storage bytes, "
+                    f"session_state {latest.state_bytes:,} bytes")
+        st.dataframe(latest.sections, width="stretch")
+        st.markdown("**Recent reruns**")
+        st.dataframe([r.summary() for r in reversed(runs)], width="stretch")
+        if latest.dump_path and os.path.exists(latest.dump_path):
+            with open(latest.dump_path, "rb") as f:
+                st.download_button("Download cProfile dump (.pstats)", f.read(),
+                                   file_name=os.path.basename(latest.dump_path))
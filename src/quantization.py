@@ -0,0 +1,143 @@
+"""
+Optional int8 CPU inference backend for the MiniLM and CLIP encoders.
+
+Set EMBEDDING_BACKEND=int8 to have src.text_encoder / src.image_encoder load
+dynamically quantized models (nn.Linear weights stored as int8, activations
+quantized on the fly). EMBEDDING_THREADS sets torch's intra-op thread count.
+Both are read once, when the encoder modules are imported.
+
+Accuracy/throughput/size check against fp32:
+    EMBEDDING_BACKEND=int8 python -m src.quantization --texts texts.txt --images path/to/images
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import torch
+
+BACKEND = os.getenv("EMBEDDING_BACKEND", "fp32").lower()
+THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+
+def configure_threads():
+    """
+    Applies EMBEDDING_THREADS (0 keeps torch's default).
+    """
+    if THREADS > 0:
+        torch.set_num_threads(THREADS)
+
+def use_int8(device="cpu"):
+    return BACKEND == "int8" and device == "cpu"
+
+def quantize(model):
+    """
+    Returns a dynamically int8-quantized copy of a CPU model's Linear layers.
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+# -----------------------------------------------------------
+# Accuracy / throughput harness
+# -----------------------------------------------------------
+
+def cosine_report(reference, candidate):
+    """
+    Row-wise cosine similarity between fp32 and quantized embeddings.
+    """
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    cos = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1) + 1e-12
+    )
+    return {
+        "n": int(len(cos)),
+        "mean_cosine": float(cos.mean()),
+        "min_cosine": float(cos.min()),
+        "p01_cosine": float(np.percentile(cos, 1)),
+    }
+
+def model_bytes(model):
+    """
+    Bytes held by a model's weights and buffers. Walks state_dict() rather than
+    parameters() so the packed int8 weights of quantized Linear layers count too.
+    """
+    def size(value):
+        if isinstance(value, torch.Tensor):
+            return value.element_size() * value.nelement()
+        if isinstance(value, (tuple, list)):
+            return sum(size(v) for v in value)
+        return 0
+
+    return sum(size(v) for v in model.state_dict().values())
+
+def _size_report(reference_model, candidate_model):
+    fp32, backend = model_bytes(reference_model), model_bytes(candidate_model)
+    return {"fp32_mb": round(fp32 / 2**20, 1), "backend_mb": round(backend / 2**20, 1),
+            "size_ratio": round(backend / fp32, 3) if fp32 else None}
+
+def _throughput(fn, items, repeat=3):
+    fn(items[:1])  # warm-up
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(items)
+        best = min(best, time.perf_counter() - start)
+    return len(items) / best
+
+def check_text_encoder(texts, batch_size=64):
+    from sentence_transformers import SentenceTransformer
+    from src import text_encoder
+
+    reference_model = SentenceTransformer(text_encoder.MODEL_NAME, device="cpu")
+    reference = lambda xs: reference_model.encode(xs, batch_size=batch_size, normalize_embeddings=True)
+    candidate = lambda xs: text_encoder.get_text_embeddings(xs, batch_size=batch_size)
+    report = cosine_report(reference(texts), candidate(texts))
+    report["fp32_per_sec"] = _throughput(reference, texts)
+    report["backend_per_sec"] = _throughput(candidate, texts)
+    report.update(_size_report(reference_model, text_encoder.model))
+    return report
+
+def check_image_encoder(image_paths, batch_size=32):
+    import clip
+    from PIL import Image
+    from src import image_encoder
+
+    reference_model, _ = clip.load(image_encoder.MODEL_NAME, device="cpu")
+
+    def reference(paths):
+        # same batching and preprocessing as image_encoder.get_image_embeddings, fp32 weights
+        out = []
+        for i in range(0, len(paths), batch_size):
+            images = torch.stack([image_encoder.preprocess(Image.open(p).convert("RGB")) for p in paths[i:i + batch_size]])
+            with torch.no_grad():
+                emb = reference_model.encode_image(images).float()
+            out.append((emb / emb.norm(dim=-1, keepdim=True)).numpy())
+        return np.concatenate(out)
+
+    candidate = lambda xs: image_encoder.get_image_embeddings(xs, batch_size=batch_size)
+
+    report = cosine_report(reference(image_paths), candidate(image_paths))
+    report["fp32_per_sec"] = _throughput(reference, image_paths)
+    report["backend_per_sec"] = _throughput(candidate, image_paths)
+    report.update(_size_report(reference_model, image_encoder.model))
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the configured embedding backend against fp32.")
+    parser.add_argument("--texts", help="file with one text per line")
+    parser.add_argument("--images", help="folder of images")
+    parser.add_argument("--limit", type=int, default=256)
+    args = parser.parse_args()
+
+    configure_threads()
+    print(f"backend={BACKEND} threads={torch.get_num_threads()}")
+    if args.texts:
+        with open(args.texts, "r", encoding="utf-8") as f:
+            texts = [l.strip() for l in f if l.strip()][:args.limit]
+        print("text:", check_text_encoder(texts))
+    if args.images:
+        exts = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+        paths = sorted(os.path.join(args.images, p) for p in os.listdir(args.images) if p.lower().endswith(exts))
+        print("image:", check_image_encoder(paths[:args.limit]))
+
+if __name__ == "__main__":
+    main()
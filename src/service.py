@@ -0,0 +1,274 @@
+"""
+Headless generation service: exposes src.agent's stages as async HTTP endpoints
+so the Streamlit UI can run as a thin client (see src.client).
+
+Run locally (no API key needed with the stub LLM):
+    STUB_LLM=1 uvicorn src.service:app --port 8000
+Scale out with more workers / nodes behind a load balancer:
+    uvicorn src.service:app --workers 4
+
+Tuning via env vars:
+    SERVICE_MAX_CONCURRENCY  in-flight LLM requests per worker (default 8)
+    SERVICE_RATE_PER_SEC     LLM calls per second (default 5)
+    SERVICE_RATE_BURST       token bucket burst size, in-process limiter only (default 10)
+    SERVICE_CACHE_TTL        seconds to keep cached analysis results (default 300)
+    SERVICE_CACHE_SIZE       max cached results, in-process cache only (default 1024)
+    SERVICE_REDIS_URL        e.g. redis://host:6379/0 - share the cache and rate limit
+                             across all workers and nodes (needs `pip install redis`)
+
+Without SERVICE_REDIS_URL the cache and rate limiter live in each worker process,
+so the effective OpenAI rate is SERVICE_RATE_PER_SEC x workers x nodes and each
+worker keeps its own cache. With it, SERVICE_RATE_PER_SEC is the total across the
+deployment (fixed one-second windows in Redis) and cached results are shared.
+
+The hashtags and keywords stages rank against the post history in the service's
+working directory, so they only make sense where the service shares that history
+with the UI. src.client does not use them for ranking: the UI host saves the
+posts, so it ranks locally and only sends the LLM fallbacks here (hashtags_llm,
+keywords with use_llm=true).
+
+Both limits apply to the model requests themselves (agent.llm_guard), not to
+stages: followup and the locally ranked hashtags/keywords only take a slot and
+a token when they actually fall back to the LLM.
+"""
+import asyncio
+import contextvars
+import inspect
+import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from fastapi import Body, FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+
+from src import agent, storage
+
+MAX_CONCURRENCY = int(os.getenv("SERVICE_MAX_CONCURRENCY", "8"))
+RATE_PER_SEC = float(os.getenv("SERVICE_RATE_PER_SEC", "5"))
+RATE_BURST = int(os.getenv("SERVICE_RATE_BURST", "10"))
+CACHE_TTL = float(os.getenv("SERVICE_CACHE_TTL", "300"))
+CACHE_SIZE = int(os.getenv("SERVICE_CACHE_SIZE", "1024"))
+REDIS_URL = os.getenv("SERVICE_REDIS_URL")
+
+# Cache policies: generative stages are never cached so "regenerate" keeps producing
+# fresh drafts; stages ranked against the saved posts include the history stamp in
+# their key, so a save invalidates them.
+NO_CACHE, CACHE, CACHE_PER_HISTORY = None, "args", "history"
+
+# stage name -> (agent function, cache policy)
+STAGES = {
+    "headlines": (agent.generate_headlines, NO_CACHE),
+    "body": (agent.generate_body, NO_CACHE),
+    "ctas": (agent.generate_ctas, NO_CACHE),
+    "hashtags": (agent.generate_hashtags, CACHE_PER_HISTORY),
+    "hashtags_llm": (agent.generate_llm_hashtags, NO_CACHE),
+    "refine": (agent.refine_post, NO_CACHE),
+    "engagement": (agent.generate_engagement_score, CACHE),
+    "extract_tone": (agent.extract_tone_from_profile, CACHE),
+    "keywords": (agent.generate_adaptive_keywords, CACHE_PER_HISTORY),
+    "followup": (agent.conversational_followup, CACHE),
+}
+STREAM_STAGES = {
+    "body": agent.stream_body,
+}
+
+
+class RateLimiter:
+    """
+    Async token bucket shared by all requests handled by this worker.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ResultCache:
+    """
+    Small in-process LRU cache with a TTL, keyed on stage name and arguments.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.items = OrderedDict()
+
+    async def get(self, key):
+        item = self.items.get(key)
+        if item is None:
+            return None
+        expires, value = item
+        if expires < time.monotonic():
+            del self.items[key]
+            return None
+        self.items.move_to_end(key)
+        return value
+
+    async def put(self, key, value):
+        self.items[key] = (time.monotonic() + self.ttl, value)
+        self.items.move_to_end(key)
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+
+
+class RedisRateLimiter:
+    """
+    Rate limit shared by every worker on every node: at most `rate` calls per
+    one-second window, counted in Redis.
+    """
+
+    def __init__(self, redis, rate, prefix="linkedin-agent:rate:"):
+        self.redis = redis
+        self.rate = rate
+        self.prefix = prefix
+
+    async def acquire(self):
+        while True:
+            now = time.time()
+            key = f"{self.prefix}{int(now)}"
+            count = await self.redis.incr(key)
+            if count == 1:
+                await self.redis.expire(key, 2)
+            if count <= self.rate:
+                return
+            await asyncio.sleep(1 - (now % 1))
+
+
+class RedisCache:
+    """
+    Result cache shared by every worker on every node (JSON values with a TTL).
+    """
+
+    def __init__(self, redis, ttl, prefix="linkedin-agent:cache:"):
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+
+    async def get(self, key):
+        value = await self.redis.get(self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    async def put(self, key, value):
+        await self.redis.set(self.prefix + key, json.dumps(value), ex=max(int(self.ttl), 1))
+
+
+def _backends():
+    if REDIS_URL:
+        import redis.asyncio as aioredis
+
+        redis = aioredis.from_url(REDIS_URL)
+        return RedisRateLimiter(redis, RATE_PER_SEC), RedisCache(redis, CACHE_TTL)
+    return RateLimiter(RATE_PER_SEC, RATE_BURST), ResultCache(CACHE_SIZE, CACHE_TTL)
+
+
+app = FastAPI(title="LinkedIn AI Agent service")
+semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+limiter, cache = _backends()
+
+
+def _cache_key(stage, kwargs, policy=CACHE):
+    key = stage + ":" + json.dumps(kwargs, sort_keys=True, default=str)
+    if policy == CACHE_PER_HISTORY:
+        key += ":" + str(storage.source_stamp())
+    return key
+
+
+def _check_arguments(fn, kwargs):
+    """
+    Rejects arguments the stage function does not accept, before anything runs.
+    """
+    try:
+        inspect.signature(fn).bind(**kwargs)
+    except TypeError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+# event loop of the request being served; copied into the worker threads by asyncio.to_thread
+_request_loop = contextvars.ContextVar("request_loop", default=None)
+
+
+@contextmanager
+def _llm_guard():
+    """
+    Installed as agent.llm_guard: blocks the worker thread until the request may
+    call the model, holding a concurrency slot for the duration of the call.
+    """
+    loop = _request_loop.get()
+    if loop is None:  # agent used outside a request
+        yield
+        return
+    asyncio.run_coroutine_threadsafe(semaphore.acquire(), loop).result()
+    try:
+        asyncio.run_coroutine_threadsafe(limiter.acquire(), loop).result()
+        yield
+    finally:
+        loop.call_soon_threadsafe(semaphore.release)
+
+
+agent.llm_guard = _llm_guard
+
+
+async def _run_stage(fn, kwargs):
+    _request_loop.set(asyncio.get_running_loop())
+    return await asyncio.to_thread(fn, **kwargs)
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok", "stub_llm": agent.USE_STUB_LLM}
+
+
+@app.post("/stages/{stage}")
+async def run_stage(stage: str, kwargs: dict = Body(default={})):
+    if stage not in STAGES:
+        raise HTTPException(status_code=404, detail=f"Invalid stage: {stage}")
+    fn, policy = STAGES[stage]
+    _check_arguments(fn, kwargs)
+    key = _cache_key(stage, kwargs, policy)
+    if policy:
+        cached = await cache.get(key)
+        if cached is not None:
+            return {"result": cached}
+    result = await _run_stage(fn, kwargs)
+    if policy:
+        await cache.put(key, result)
+    return {"result": result}
+
+
+@app.post("/stages/{stage}/stream")
+async def stream_stage(stage: str, kwargs: dict = Body(default={})):
+    if stage not in STREAM_STAGES:
+        raise HTTPException(status_code=404, detail=f"Stage does not support streaming: {stage}")
+    _check_arguments(STREAM_STAGES[stage], kwargs)
+    chunks = STREAM_STAGES[stage](**kwargs)
+
+    async def body():
+        # pull chunks off the sync generator in a thread; the model request inside it
+        # holds its concurrency slot until the stream ends
+        _request_loop.set(asyncio.get_running_loop())
+        try:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            await asyncio.to_thread(chunks.close)  # releases the slot if the client went away
+
+    return StreamingResponse(body(), media_type="text/plain; charset=utf-8")
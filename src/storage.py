@@ -1,13 +1,41 @@
 import json
+import logging
 import os
+import re
+import glob
 from datetime import datetime
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+from src import profiler
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute
+except ImportError:  # snapshot is optional, analytics fall back to the JSON file
+    pa = None
+
+logger = logging.getLogger(__name__)
 
 HISTORY_FILE = "post_history.json"
+SNAPSHOT_FILE = "post_history.arrow"
+
+ENGAGEMENT_PATTERN = r"(10|[1-9])"
+SNAPSHOT_MAX_SEGMENTS = 64
+COLUMNS = ["topic", "tone", "audience", "headline", "body", "cta",
+           "predicted_engagement", "engagement", "keywords", "hashtags", "timestamp"]
+TEXT_COLUMNS = ["topic", "headline", "body", "cta", "predicted_engagement"]
+
+# in-process cache of the snapshot as a DataFrame, keyed on the history file stamp
+_frame_cache = {"key": None, "frame": None, "keywords": None}
 
 def load_history():
     if os.path.exists(HISTORY_FILE):
         try:
             with open(HISTORY_FILE, "r", encoding="utf-8") as f:
+                profiler.count("storage_bytes", os.fstat(f.fileno()).st_size)
                 return json.load(f)
         except Exception:
             return []
@@ -15,16 +43,19 @@ def load_history():
 
 def save_post(post):
     history = load_history()
+    previous_stamp = source_stamp()
     # ensure a minimal structure copy so future edits don't mutate saved
     entry = {
         "topic": post.get("topic"),
         "tone": post.get("tone"),
+        "audience": post.get("audience"),
         "headline": post.get("headline"),
         "body": post.get("body"),
         "hashtags": post.get("hashtags", []),
         "user_keywords": post.get("user_keywords", []),
         "adaptive_keywords": post.get("adaptive_keywords", []),
         "cta": post.get("cta", []),
+        "image": post.get("image"),
         "predicted_engagement": post.get("predicted_engagement"),
         "extracted_tone": post.get("extracted_tone"),
         "timestamp": datetime.now().isoformat()
@@ -32,23 +63,339 @@ def save_post(post):
     history.append(entry)
     with open(HISTORY_FILE, "w", encoding="utf-8") as f:
         json.dump(history, f, indent=2, ensure_ascii=False)
+    _append_snapshot(entry, previous_stamp)
+    try:
+        # imported here (hashtags imports storage); only embeds when the index is
+        # already loaded in this process, otherwise it is just marked stale
+        from src.hashtags import index_post
+        index_post(entry, previous_stamp)
+    except Exception:
+        logger.exception("Could not update the hashtag index; it will be rebuilt on next use")
+
+# -----------------------------------------------------------
+# Columnar snapshot (Arrow IPC, memory-mapped)
+# -----------------------------------------------------------
+
+def _keyword_list(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [str(k).strip() for k in value if str(k).strip()]
+
+def normalize_keywords(*groups):
+    # lowercased and de-duplicated up front so analytics never touch strings per row
+    seen = []
+    for group in groups:
+        for k in _keyword_list(group):
+            k = k.lower()
+            if k not in seen:
+                seen.append(k)
+    return seen
+
+def _parse_engagement(value):
+    m = re.search(ENGAGEMENT_PATTERN, str(value or ""))
+    return float(m.group(0)) if m else np.nan
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def _entry_row(entry):
+    """
+    Flattens a saved history entry into one snapshot row.
+    """
+    cta = entry.get("cta")
+    if isinstance(cta, list):
+        cta = ", ".join(str(c) for c in cta)
+    return {
+        "topic": entry.get("topic"),
+        "tone": entry.get("tone"),
+        "audience": entry.get("audience"),
+        "headline": entry.get("headline"),
+        "body": entry.get("body"),
+        "cta": cta or None,
+        "predicted_engagement": str(entry.get("predicted_engagement") or ""),
+        "engagement": _parse_engagement(entry.get("predicted_engagement")),
+        "keywords": normalize_keywords(entry.get("user_keywords"), entry.get("adaptive_keywords")),
+        "hashtags": [h.lstrip("#") for h in normalize_keywords(entry.get("hashtags"))],
+        "timestamp": _parse_timestamp(entry.get("timestamp")),
+    }
+
+def _schema():
+    return pa.schema([
+        ("topic", pa.string()),
+        ("tone", pa.string()),
+        ("audience", pa.string()),
+        ("headline", pa.string()),
+        ("body", pa.string()),
+        ("cta", pa.string()),
+        ("predicted_engagement", pa.string()),
+        ("engagement", pa.float64()),
+        ("keywords", pa.list_(pa.string())),
+        ("hashtags", pa.list_(pa.string())),
+        ("timestamp", pa.timestamp("us")),
+    ])
+
+def _rows_to_table(rows):
+    return pa.Table.from_pylist(rows, schema=_schema())
+
+def source_stamp():
+    """
+    Identifies the current state of HISTORY_FILE (None if there is no history).
+    """
+    try:
+        st = os.stat(HISTORY_FILE)
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+def _snapshot_stamp(table):
+    meta = table.schema.metadata or {}
+    stamp = meta.get(b"source")
+    return stamp.decode() if stamp else None
+
+def _segment_paths():
+    """
+    Append segments written by save_post since the base snapshot, oldest first.
+    """
+    return sorted(glob.glob(glob.escape(SNAPSHOT_FILE) + ".seg*"))
+
+def _read_ipc(path):
+    with pa.memory_map(path, "r") as source:
+        profiler.count("storage_bytes", source.size())
+        return pa.ipc.open_file(source).read_all()
+
+def _snapshot_head():
+    """
+    Returns (stamp, schema_ok) of the newest snapshot piece without reading any rows.
+    """
+    if pa is None or not os.path.exists(SNAPSHOT_FILE):
+        return None, False
+    segments = _segment_paths()
+    try:
+        with pa.memory_map(segments[-1] if segments else SNAPSHOT_FILE, "r") as source:
+            schema = pa.ipc.open_file(source).schema
+    except Exception:
+        return None, False
+    meta = schema.metadata or {}
+    stamp = meta.get(b"source")
+    return (stamp.decode() if stamp else None), schema.remove_metadata().equals(_schema())
+
+def _read_snapshot():
+    """
+    Base snapshot plus its append segments as one table, stamped with the newest piece.
+    """
+    if pa is None or not os.path.exists(SNAPSHOT_FILE):
+        return None
+    try:
+        tables = [_read_ipc(p) for p in [SNAPSHOT_FILE] + _segment_paths()]
+        stamp = _snapshot_stamp(tables[-1])
+        table = pa.concat_tables([t.replace_schema_metadata(None) for t in tables])
+    except Exception:
+        return None
+    return table.replace_schema_metadata({"source": stamp or ""})
+
+def _write_ipc(path, table):
+    tmp = path + ".tmp"
+    with pa.OSFile(tmp, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return tmp
+
+def _write_snapshot(table, stamp):
+    """
+    Writes table as the new base snapshot and drops the append segments.
+    Segments are removed before the base is swapped in, so an interrupted write
+    leaves a stale stamp (and a rebuild) rather than duplicated rows.
+    """
+    table = table.replace_schema_metadata({"source": stamp})
+    tmp = _write_ipc(SNAPSHOT_FILE, table)
+    for path in _segment_paths():
+        os.remove(path)
+    os.replace(tmp, SNAPSHOT_FILE)
+    return table
+
+def _refresh_snapshot():
+    """
+    Returns the snapshot table, rebuilding it from HISTORY_FILE only when the
+    JSON file changed outside of save_post.
+    """
+    stamp = source_stamp()
+    if stamp is None:
+        return None
+    head_stamp, schema_ok = _snapshot_head()
+    if head_stamp == stamp and schema_ok:
+        table = _read_snapshot()
+        if table is not None:
+            return table
+    table = _rows_to_table([_entry_row(e) for e in load_history()])
+    try:
+        return _write_snapshot(table, stamp)
+    except OSError:
+        return table
+
+def _append_snapshot(entry, previous_stamp):
+    """
+    Appends a freshly saved entry to the snapshot without re-parsing the JSON history.
+    Each save writes one small segment file; every SNAPSHOT_MAX_SEGMENTS saves the
+    segments are folded back into the base file (a full rewrite, amortized).
+    """
+    if pa is None:
+        return
+    head_stamp, schema_ok = _snapshot_head()
+    if previous_stamp is None or head_stamp != previous_stamp or not schema_ok:
+        _refresh_snapshot()
+        return
+    row = _rows_to_table([_entry_row(entry)])
+    stamp = source_stamp()
+    segments = _segment_paths()
+    try:
+        if len(segments) >= SNAPSHOT_MAX_SEGMENTS:
+            table = _read_snapshot()
+            _write_snapshot(pa.concat_tables([table.replace_schema_metadata(None), row]), stamp)
+        else:
+            seq = int(segments[-1].rsplit(".seg", 1)[1]) + 1 if segments else 0
+            path = f"{SNAPSHOT_FILE}.seg{seq:06d}"
+            os.replace(_write_ipc(path, row.replace_schema_metadata({"source": stamp})), path)
+    except (OSError, pa.ArrowException):
+        pass
+
+def _frame_from_rows(rows):
+    frame = pd.DataFrame(rows, columns=COLUMNS)
+    frame["engagement"] = frame["engagement"].astype(float)
+    frame["timestamp"] = pd.to_datetime(frame["timestamp"], errors="coerce")
+    return frame
+
+def _arrow_types(dtype):
+    # long text and list columns stay Arrow-backed (no per-row Python objects);
+    # tone/audience/engagement/timestamp convert to plain pandas dtypes for grouping
+    if pa.types.is_list(dtype) or pa.types.is_large_string(dtype):
+        return pd.ArrowDtype(dtype)
+    return None
+
+def _table_to_frame(table):
+    text = [c for c in TEXT_COLUMNS if c in table.column_names]
+    # mark text columns large_string so _arrow_types keeps them Arrow-backed
+    for c in text:
+        i = table.column_names.index(c)
+        table = table.set_column(i, c, table.column(c).cast(pa.large_string()))
+    return table.to_pandas(types_mapper=_arrow_types)
+
+def history_frame():
+    """
+    Returns post history as a DataFrame (one row per post, `keywords` as a list column).
+    Backed by the memory-mapped snapshot and cached until the history changes.
+    Text and list columns are Arrow-backed when pyarrow is available (missing values are pd.NA).
+    """
+    stamp = source_stamp()
+    if stamp is None:
+        return _frame_from_rows([])
+    if _frame_cache["key"] == stamp:
+        return _frame_cache["frame"]
+    if pa is None:
+        frame = _frame_from_rows([_entry_row(e) for e in load_history()])
+    else:
+        table = _refresh_snapshot()
+        frame = _table_to_frame(table) if table is not None else _frame_from_rows([])
+    _frame_cache["key"] = stamp
+    _frame_cache["frame"] = frame
+    _frame_cache["keywords"] = None
+    return frame
+
+def latest_posts(n=20, offset=0, frame=None):
+    """
+    Returns n posts, newest first, skipping the offset newest ones (for paging the history).
+    """
+    frame = history_frame() if frame is None else frame
+    end = len(frame) - offset
+    return frame.iloc[max(end - n, 0):max(end, 0)].iloc[::-1]
+
+# -----------------------------------------------------------
+# Vectorized analytics
+# -----------------------------------------------------------
+
+def keyword_frame(frame=None):
+    """
+    One row per (post, keyword) with columns index, keyword (categorical) and engagement.
+    Built once per history change for the cached frame.
+    """
+    frame = history_frame() if frame is None else frame
+    cached = frame is _frame_cache["frame"]
+    if cached and _frame_cache["keywords"] is not None:
+        return _frame_cache["keywords"]
+    if pa is not None:
+        lists = pa.array(frame["keywords"], type=pa.list_(pa.string()))
+        parents = pa.compute.list_parent_indices(lists).to_numpy()
+        keywords = pa.compute.list_flatten(lists).dictionary_encode().to_pandas()
+    else:
+        lengths = frame["keywords"].map(len).to_numpy(dtype=np.int64)
+        parents = np.repeat(np.arange(len(frame)), lengths)
+        keywords = pd.Categorical(np.fromiter(chain.from_iterable(frame["keywords"]), dtype=object,
+                                              count=int(lengths.sum())))
+    out = pd.DataFrame({
+        "index": frame.index.to_numpy()[parents],
+        "keyword": keywords,
+        "engagement": frame["engagement"].to_numpy()[parents],
+    })
+    if cached:
+        _frame_cache["keywords"] = out
+    return out
+
+def engagement_by(column, frame=None):
+    """
+    Post count and mean engagement grouped by 'tone', 'audience', 'week' or 'keyword'.
+    """
+    frame = history_frame() if frame is None else frame
+    if column == "keyword":
+        kw = keyword_frame(frame)
+        grouped = kw.groupby("keyword", observed=True)["engagement"]
+    else:
+        if column == "week":
+            keys = frame["timestamp"].dt.to_period("W").dt.start_time.rename("week")
+        else:
+            keys = frame[column].fillna("unspecified")
+        grouped = frame.groupby(keys)["engagement"]
+    out = grouped.agg(posts="size", engagement="mean")
+    return out.sort_index() if column == "week" else out.sort_values("posts", ascending=False)
+
+def keyword_lift(min_posts=2, frame=None):
+    """
+    Mean engagement of posts using each keyword relative to the overall mean (1.0 = no lift).
+    """
+    frame = history_frame() if frame is None else frame
+    out = engagement_by("keyword", frame=frame)
+    overall = frame["engagement"].mean()
+    out = out[out["posts"] >= min_posts].copy()
+    out["lift"] = out["engagement"] / overall if overall else np.nan
+    return out.sort_values("lift", ascending=False)
+
+def engagement_trend(freq="W", keyword=None, frame=None):
+    """
+    Engagement resampled over time with a least-squares trend line.
+    keyword: optionally restrict to posts using this keyword.
+    """
+    frame = history_frame() if frame is None else frame
+    if keyword:
+        kw = keyword_frame(frame)
+        frame = frame.loc[kw.loc[kw["keyword"] == keyword.strip().lower(), "index"]]
+    series = frame.dropna(subset=["timestamp"]).set_index("timestamp")["engagement"].sort_index()
+    out = series.resample(freq).agg(["size", "mean"]).rename(columns={"size": "posts", "mean": "engagement"})
+    out["trend"] = np.nan
+    valid = out["engagement"].notna().to_numpy()
+    if valid.sum() >= 2:
+        x = np.arange(len(out))
+        slope, intercept = np.polyfit(x[valid], out["engagement"].to_numpy()[valid], 1)
+        out["trend"] = intercept + slope * x
+    return out
 
 def get_analytics():
-    history = load_history()
-    if not history:
+    frame = history_frame()
+    if frame.empty:
         return {"total_posts": 0, "average_engagement": 0.0, "tone_distribution": {}}
-    # engagement: try to parse numeric prefix from predicted_engagement
-    total = 0.0
-    count = 0
-    tones = {}
-    for p in history:
-        pe = p.get("predicted_engagement", "")
-        import re
-        m = re.search(r"([1-9]|10)", str(pe))
-        if m:
-            total += float(m.group(0))
-            count += 1
-        t = p.get("tone", "unspecified")
-        tones[t] = tones.get(t, 0) + 1
-    avg = (total / count) if count else 0.0
-    return {"total_posts": len(history), "average_engagement": avg, "tone_distribution": tones}
+    engagement = frame["engagement"]
+    avg = float(engagement.mean()) if engagement.notna().any() else 0.0
+    tones = frame["tone"].fillna("unspecified").value_counts().to_dict()
+    return {"total_posts": len(frame), "average_engagement": avg, "tone_distribution": tones}
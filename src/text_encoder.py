@@ -1,7 +1,14 @@
 from sentence_transformers import SentenceTransformer
+from src.quantization import configure_threads, quantize, use_int8
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
 
 # Use a small, fast model for embeddings
-model = SentenceTransformer('all-MiniLM-L6-v2')
+configure_threads()
+model = SentenceTransformer(MODEL_NAME)
+if use_int8(model.device.type):
+    # EMBEDDING_BACKEND=int8: dynamically quantized Linear layers (see src.quantization)
+    model = quantize(model)
 
 def get_text_embedding(text: str):
     """
@@ -9,3 +16,9 @@ def get_text_embedding(text: str):
     """
     embedding = model.encode(text, normalize_embeddings=True)
     return embedding
+
+def get_text_embeddings(texts, batch_size=64):
+    """
+    Returns an (n, 384) matrix of normalized embeddings for a list of strings.
+    """
+    return model.encode(list(texts), batch_size=batch_size, normalize_embeddings=True)
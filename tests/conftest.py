@@ -0,0 +1,29 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import storage
+
+
+@pytest.fixture
+def history_dir(tmp_path, monkeypatch):
+    """
+    Runs a test in an empty directory with storage pointed at fresh history files.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(storage, "HISTORY_FILE", str(tmp_path / "post_history.json"))
+    monkeypatch.setattr(storage, "SNAPSHOT_FILE", str(tmp_path / "post_history.arrow"))
+    monkeypatch.setattr(storage, "_frame_cache", {"key": None, "frame": None, "keywords": None})
+    return tmp_path
+
+
+@pytest.fixture
+def write_history(history_dir):
+    def _write(entries):
+        with open(storage.HISTORY_FILE, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+    return _write
@@ -0,0 +1,19 @@
+import pytest
+
+pytest.importorskip("httpx")
+
+from src import client
+
+
+def test_hashtags_ranked_locally_llm_only_for_the_rest(monkeypatch):
+    calls = []
+    monkeypatch.setattr(client, "recommend_hashtags", lambda headline, body, keywords=None, n=5: ["#python"])
+
+    def call_stage(stage, **kwargs):
+        calls.append(stage)
+        return ["#Python", "#coding"]
+
+    monkeypatch.setattr(client, "_call_stage", call_stage)
+    assert client.generate_hashtags("h", "b", n=2) == ["#python", "#coding"]
+    assert client.generate_hashtags("h", "b", n=2, use_llm=False) == ["#python"]
+    assert calls == ["hashtags_llm"]
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+
+from src import hashtags, storage
+
+pytest.importorskip("pyarrow")
+
+
+def _fake_embed(texts):
+    # one axis per topic word, so posts about the same thing share a direction
+    vocab = ["python", "hiring", "design"]
+    out = np.zeros((len(texts), hashtags.EMBEDDING_DIM), dtype=np.float32)
+    for i, text in enumerate(texts):
+        for j, word in enumerate(vocab):
+            out[i, j] = text.lower().count(word)
+        out[i, -1] = 0.01
+    return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def index_env(history_dir, monkeypatch):
+    calls = []
+
+    def embed(texts):
+        calls.append(list(texts))
+        return _fake_embed(texts)
+
+    monkeypatch.setattr(hashtags, "_embed", embed)
+    monkeypatch.setattr(hashtags, "HASHTAG_INDEX_FILE", str(history_dir / "hashtag_index.npz"))
+    monkeypatch.setattr(hashtags, "_state", {"index": None})
+    return calls
+
+
+def _save(headline, body, tags, keywords=()):
+    storage.save_post({"headline": headline, "body": body, "hashtags": tags, "user_keywords": list(keywords)})
+
+
+def test_recommends_from_history(index_env):
+    _save("Python tips", "python python", ["#Python"], ["code"])
+    _save("Hiring now", "hiring engineers #jobs", ["#Hiring"])
+    assert hashtags.recommend_hashtags("More python", "python again", n=1) == ["#python"]
+    assert hashtags.recommend_hashtags("We are hiring", "hiring", n=2)[0] in ("#hiring", "#jobs")
+
+
+def test_save_without_loaded_index_does_not_embed(index_env):
+    _save("Python tips", "python", ["#Python"])
+    assert index_env == []
+    assert hashtags.recommend_hashtags("python", "python", n=1) == ["#python"]
+
+
+def test_save_with_loaded_index_adds_incrementally(index_env, monkeypatch):
+    _save("Python tips", "python", ["#Python"])
+    hashtags.recommend_hashtags("python", "python")
+    index = hashtags._state["index"]
+    monkeypatch.setattr(hashtags, "build_index", lambda: pytest.fail("unexpected rebuild"))
+    _save("Design notes", "design", ["#Design"])
+    assert hashtags._state["index"] is index
+    assert index.stamp == storage.source_stamp()
+    assert hashtags.recommend_hashtags("design", "design", n=1) == ["#design"]
+
+
+def test_out_of_sync_index_is_marked_stale(index_env):
+    _save("Python tips", "python", ["#Python"])
+    hashtags.recommend_hashtags("python", "python")
+    hashtags._state["index"].stamp = "elsewhere"
+    _save("Design notes", "design", ["#Design"])
+    assert hashtags._state["index"] is None
+    assert "#design" in hashtags.recommend_hashtags("design", "design")
+
+
+def test_missing_text_in_history(index_env, write_history):
+    write_history([{"headline": None, "body": None, "hashtags": ["#x"]}, {"headline": "h"}])
+    assert hashtags.recommend_hashtags("anything", None, n=1) == ["#x"]
+
+
+def test_index_grows_without_copying_per_tag():
+    index = hashtags.HashtagIndex()
+    vector = _fake_embed(["python"])[0]
+    for i in range(100):
+        index.add([f"tag{i}"], [], vector)
+    assert index.sums.shape == (100, hashtags.EMBEDDING_DIM)
+    assert len(index._sums) == 128
+    assert index.counts.sum() == 100
+
+
+def test_rank_holds_the_lock(index_env, monkeypatch):
+    _save("Python tips", "python", ["#Python"], ["code"])
+    hashtags.recommend_hashtags("python", "python")
+    index = hashtags._state["index"]
+    centroids = index.centroids
+
+    def locked_centroids(*args):
+        # index_post cannot add tags between sizing the scores and the co-occurrence boost
+        assert not hashtags._lock.acquire(blocking=False)
+        return centroids(*args)
+
+    monkeypatch.setattr(index, "centroids", locked_centroids)
+    assert hashtags.recommend_hashtags("python", "python", keywords=["code"], n=1) == ["#python"]
+
+
+def test_merge_hashtags():
+    assert hashtags.merge_hashtags(["#AI"], ["#ai", "#ml", "#data"], n=2) == ["#AI", "#ml"]
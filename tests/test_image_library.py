@@ -0,0 +1,44 @@
+import sys
+
+import numpy as np
+import pytest
+
+from src import image_library
+
+
+@pytest.fixture
+def folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_library, "_libraries", {})
+    (tmp_path / "a.png").write_bytes(b"a")
+    (tmp_path / "b.jpg").write_bytes(b"b")
+    return str(tmp_path)
+
+
+def _fake_encode(self, rels):
+    return {rel: np.eye(4, dtype=np.float32)[i % 4] for i, rel in enumerate(rels)}
+
+
+def test_matching_never_builds_the_index(folder, monkeypatch):
+    monkeypatch.setattr(image_library.ImageLibrary, "refresh", lambda self: pytest.fail("matching scanned the folder"))
+    assert image_library.match_images("headline", "body", folder=folder) == []
+    assert "src.image_encoder" not in sys.modules
+
+
+def test_failed_first_refresh_is_not_cached(folder, monkeypatch):
+    def broken(self, rels):
+        raise RuntimeError("no CLIP")
+
+    monkeypatch.setattr(image_library.ImageLibrary, "_encode", broken)
+    with pytest.raises(RuntimeError):
+        image_library.get_library(folder, refresh=True)
+    assert folder not in image_library._libraries
+
+
+def test_picks_up_index_built_elsewhere(folder, monkeypatch):
+    monkeypatch.setattr(image_library.ImageLibrary, "_encode", _fake_encode)
+    library = image_library.get_library(folder)
+    assert len(library) == 0
+    stats = image_library.ImageLibrary(folder).refresh()  # e.g. python -m src.image_library
+    assert stats["added"] == 2
+    assert image_library.get_library(folder) is library
+    assert len(library) == 2
@@ -0,0 +1,71 @@
+import os
+import zlib
+
+import numpy as np
+import pytest
+
+from src import keywords
+
+
+def _fake_embed(phrases):
+    out = []
+    for phrase in phrases:
+        rng = np.random.default_rng(zlib.crc32(phrase.lower().encode()))
+        v = rng.normal(size=8).astype(np.float32)
+        out.append(v / np.linalg.norm(v))
+    return np.stack(out)
+
+
+@pytest.fixture
+def embed(monkeypatch):
+    monkeypatch.setattr(keywords, "_embed", _fake_embed)
+
+
+def test_ngrams_skip_stopword_edges_and_short_words():
+    grams = keywords.ngram_candidates("The future of work. AI and ml, for teams")
+    assert "future of work" in grams
+    assert "future" in grams and "work" in grams
+    assert "The future" not in grams and "of work" not in grams
+    assert "AI" in grams and "ml" not in grams
+    assert "teams" in grams and "for teams" not in grams
+
+
+def test_profile_candidates_are_capped_by_frequency():
+    profile = "data platform " * 5 + " ".join(f"word{i}" for i in range(300))
+    candidates = keywords._profile_candidates(profile, limit=10)
+    assert len(candidates) == 10
+    assert candidates[0] in ("data", "platform", "data platform")
+
+
+def test_mmr_prefers_diverse_results():
+    query = np.array([1.0, 0.0, 0.0])
+    vectors = np.array([[0.8, 0.6, 0.0], [0.78, 0.626, 0.0], [0.7, -0.714, 0.0]])
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    assert keywords.mmr(query, vectors, 2) == [0, 2]
+    assert keywords.mmr(query, vectors, 2, lambda_=1.0) == [0, 1]
+
+
+def test_dedupe_is_case_insensitive():
+    assert keywords._dedupe(["AI", "ai", "Teams", "remote work"], exclude=["Remote Work"]) == ["AI", "Teams"]
+
+
+def test_extract_excludes_the_topic(embed):
+    result = keywords.extract_keywords("Remote work", profile_summary="Remote work advocate, distributed teams",
+                                       n=5, use_history=False)
+    assert result
+    assert "remote work" not in [k.lower() for k in result]
+    assert len(result) == len({k.lower() for k in result})
+
+
+def test_blank_topic():
+    assert keywords.extract_keywords("  ") == []
+
+
+def test_agent_falls_back_to_llm(monkeypatch):
+    os.environ.setdefault("STUB_LLM", "1")
+    pytest.importorskip("openai")
+    from src import agent
+
+    monkeypatch.setattr(agent, "extract_keywords", lambda topic, profile_summary=None, n=10: [])
+    monkeypatch.setattr(agent, "_call_openai", lambda prompt, **kwargs: "Hiring, hiring\nRemote teams, #culture")
+    assert agent.generate_adaptive_keywords("remote hiring") == ["Hiring", "Remote teams", "culture"]
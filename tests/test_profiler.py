@@ -0,0 +1,25 @@
+import os
+
+from src import profiler
+
+
+def test_query_param_needs_opt_in(monkeypatch):
+    monkeypatch.setattr(profiler, "ENABLED", False)
+    monkeypatch.setattr(profiler, "ALLOW_QUERY", False)
+    assert not profiler.is_enabled({"profile": "1"})
+    monkeypatch.setattr(profiler, "ALLOW_QUERY", True)
+    assert profiler.is_enabled({"profile": "1"})
+    assert not profiler.is_enabled({})
+
+
+def test_old_dumps_are_deleted(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiler, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiler, "MAX_RUNS", 3)
+    state = {}
+    for _ in range(5):
+        profiler.start_rerun(state)
+        profiler.mark("work")
+        profiler.finish_rerun(state)
+    assert len(state[profiler.STATE_KEY]) == 3
+    assert len([p for p in os.listdir(tmp_path) if p.endswith(".pstats")]) == 3
+    assert os.path.exists(state[profiler.STATE_KEY][-1].dump_path)
@@ -0,0 +1,105 @@
+import os
+
+import pytest
+
+os.environ.setdefault("STUB_LLM", "1")
+pytest.importorskip("fastapi")
+pytest.importorskip("openai")
+
+from fastapi.testclient import TestClient
+
+from src import service, storage
+
+
+@pytest.fixture
+def client(history_dir, monkeypatch):
+    monkeypatch.setattr(service, "cache", service.ResultCache(16, 60))
+    monkeypatch.setattr(service, "limiter", service.RateLimiter(1000, 1000))
+    return TestClient(service.app, raise_server_exceptions=False)
+
+
+def test_healthz(client):
+    resp = client.get("/healthz")
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "ok", "stub_llm": True}
+
+
+def test_headlines_stage(client):
+    resp = client.post("/stages/headlines", json={"topic": "remote work", "n_variations": 3})
+    assert resp.status_code == 200
+    assert len(resp.json()["result"]) == 3
+
+
+def test_cacheable_stage_runs_once(client, monkeypatch):
+    calls = []
+
+    def engagement(headline, body, audience=None, profile_summary=None):
+        calls.append(headline)
+        return "7 - fine"
+
+    monkeypatch.setitem(service.STAGES, "engagement", (engagement, service.CACHE))
+    for _ in range(2):
+        resp = client.post("/stages/engagement", json={"headline": "h", "body": "b"})
+        assert resp.json() == {"result": "7 - fine"}
+    assert calls == ["h"]
+
+
+def test_unknown_stage_is_404(client):
+    assert client.post("/stages/nope", json={}).status_code == 404
+    assert client.post("/stages/headlines/stream", json={}).status_code == 404
+
+
+def test_bad_arguments_are_422(client):
+    assert client.post("/stages/headlines", json={"topic": "t", "colour": "red"}).status_code == 422
+    assert client.post("/stages/headlines", json={}).status_code == 422
+    assert client.post("/stages/body/stream", json={"heading": "h"}).status_code == 422
+
+
+def test_internal_type_error_is_500(client, monkeypatch):
+    def broken(topic):
+        return len(None)
+
+    monkeypatch.setitem(service.STAGES, "headlines", (broken, service.NO_CACHE))
+    assert client.post("/stages/headlines", json={"topic": "t"}).status_code == 500
+
+
+def test_body_stream(client):
+    with client.stream("POST", "/stages/body/stream", json={"headline": "Shipping faster"}) as resp:
+        assert resp.status_code == 200
+        text = "".join(resp.iter_text())
+    assert "Stub response" in text
+
+
+def test_keywords_cached_until_history_changes(client, monkeypatch):
+    calls = []
+
+    def keywords(topic, profile_summary=None, n=10, use_llm=False):
+        calls.append(topic)
+        return [f"kw{len(calls)}"]
+
+    monkeypatch.setitem(service.STAGES, "keywords", (keywords, service.STAGES["keywords"][1]))
+    first = client.post("/stages/keywords", json={"topic": "t"}).json()
+    assert client.post("/stages/keywords", json={"topic": "t"}).json() == first
+    storage.save_post({"topic": "t", "headline": "h", "body": "b"})
+    assert client.post("/stages/keywords", json={"topic": "t"}).json() != first
+    assert len(calls) == 2
+
+
+class CountingLimiter:
+    def __init__(self):
+        self.tokens = 0
+
+    async def acquire(self):
+        self.tokens += 1
+
+
+def test_only_model_requests_are_rate_limited(client, monkeypatch):
+    limiter = CountingLimiter()
+    monkeypatch.setattr(service, "limiter", limiter)
+    draft = {"topic": "a long enough topic", "tone": "casual", "audience": "peers", "user_keywords": "ai"}
+    assert client.post("/stages/followup", json={"draft": draft}).status_code == 200
+    assert limiter.tokens == 0
+    client.post("/stages/headlines", json={"topic": "t"})
+    with client.stream("POST", "/stages/body/stream", json={"headline": "h"}) as resp:
+        "".join(resp.iter_text())
+    assert limiter.tokens == 2
@@ -0,0 +1,141 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from src import storage
+
+pa = pytest.importorskip("pyarrow")
+
+
+def _post(tone, engagement, keywords, timestamp, audience=None):
+    return {
+        "topic": "t",
+        "tone": tone,
+        "audience": audience,
+        "headline": f"{tone} post",
+        "body": "body",
+        "user_keywords": keywords,
+        "adaptive_keywords": [],
+        "predicted_engagement": f"{engagement} — rationale",
+        "timestamp": timestamp,
+    }
+
+
+@pytest.fixture
+def sample(write_history):
+    write_history([
+        _post("casual", 8, "AI, Leadership", "2026-01-05T09:00:00", audience="peers"),
+        _post("casual", 6, "ai", "2026-01-06T09:00:00", audience="peers"),
+        _post("formal", 4, "biotech", "2026-01-13T09:00:00", audience="founders"),
+        _post(None, 10, "ai, biotech", "2026-01-20T09:00:00"),
+    ])
+
+
+def test_engagement_by_tone_and_audience(sample):
+    by_tone = storage.engagement_by("tone")
+    assert by_tone.loc["casual", "posts"] == 2
+    assert by_tone.loc["casual", "engagement"] == 7.0
+    assert by_tone.loc["unspecified", "engagement"] == 10.0
+
+    by_audience = storage.engagement_by("audience")
+    assert by_audience.loc["peers", "posts"] == 2
+    assert by_audience.loc["unspecified", "posts"] == 1
+
+
+def test_engagement_by_week_and_keyword(sample):
+    by_week = storage.engagement_by("week")
+    assert list(by_week["posts"]) == [2, 1, 1]
+    assert list(by_week["engagement"]) == [7.0, 4.0, 10.0]
+
+    by_keyword = storage.engagement_by("keyword")
+    # keywords are lowercased and de-duplicated per post
+    assert by_keyword.loc["ai", "posts"] == 3
+    assert by_keyword.loc["ai", "engagement"] == 8.0
+    assert by_keyword.loc["leadership", "posts"] == 1
+
+
+def test_ten_is_parsed_as_ten(sample):
+    assert storage.get_analytics()["average_engagement"] == 7.0
+
+
+@pytest.mark.parametrize("reply, expected", [("10 - great hook", 10.0), ("Score: 7/10", 7.0), ("1", 1.0)])
+def test_agent_engagement_score_round_trips(monkeypatch, reply, expected):
+    os.environ.setdefault("STUB_LLM", "1")
+    pytest.importorskip("openai")
+    from src import agent
+
+    monkeypatch.setattr(agent, "_call_openai", lambda prompt, **kwargs: reply)
+    score = agent.generate_engagement_score("headline", "body")
+    assert storage._entry_row({"predicted_engagement": score})["engagement"] == expected
+
+
+def test_keyword_lift(sample):
+    lift = storage.keyword_lift(min_posts=2)
+    assert set(lift.index) == {"ai", "biotech"}
+    assert lift.loc["ai", "lift"] == pytest.approx(8.0 / 7.0)
+    assert lift.loc["biotech", "lift"] == pytest.approx(1.0)
+    assert lift.index[0] == "ai"
+
+
+def test_engagement_trend(sample):
+    trend = storage.engagement_trend("W")
+    assert list(trend["posts"]) == [2, 1, 1]
+    slope = np.diff(trend["trend"].to_numpy())
+    assert np.allclose(slope, slope[0])
+
+    biotech = storage.engagement_trend("W", keyword="Biotech")
+    assert biotech["posts"].sum() == 2
+
+
+def test_empty_history(history_dir):
+    assert storage.get_analytics() == {"total_posts": 0, "average_engagement": 0.0, "tone_distribution": {}}
+    assert storage.engagement_by("keyword").empty
+    assert storage.keyword_lift().empty
+    assert storage.engagement_trend().empty
+
+
+def test_snapshot_rebuilt_when_json_changes_outside_save_post(sample, write_history):
+    assert len(storage.history_frame()) == 4
+    with open(storage.HISTORY_FILE, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    write_history(entries + [_post("formal", 2, "", "2026-01-21T09:00:00")])
+    assert len(storage.history_frame()) == 5
+    assert len(storage._read_snapshot()) == 5
+
+
+def test_old_schema_snapshot_is_rebuilt(sample):
+    old = pa.table({"topic": ["stale"], "engagement": [1.0]})
+    old = old.replace_schema_metadata({"source": storage.source_stamp()})
+    with pa.OSFile(storage.SNAPSHOT_FILE, "wb") as sink:
+        with pa.ipc.new_file(sink, old.schema) as writer:
+            writer.write_table(old)
+
+    frame = storage.history_frame()
+    assert len(frame) == 4
+    assert "hashtags" in frame.columns
+
+
+def test_save_post_appends_segments_and_compacts(history_dir, monkeypatch):
+    monkeypatch.setattr(storage, "SNAPSHOT_MAX_SEGMENTS", 2)
+    for i in range(4):
+        storage.save_post({"topic": f"t{i}", "tone": "casual", "predicted_engagement": "5", "user_keywords": "ai"})
+        frame = storage.history_frame()
+        assert list(frame["topic"]) == [f"t{j}" for j in range(i + 1)]
+        assert len(storage._segment_paths()) <= 2
+    # the last save folded the segments back into the base file
+    assert storage._segment_paths() == []
+    assert storage.engagement_by("keyword").loc["ai", "posts"] == 4
+
+
+def test_latest_posts_pages_newest_first(sample):
+    assert list(storage.latest_posts(2)["engagement"]) == [10.0, 4.0]
+    assert list(storage.latest_posts(2, offset=2)["engagement"]) == [6.0, 8.0]
+    assert storage.latest_posts(2, offset=4).empty
+
+
+def test_frame_without_pyarrow(sample, monkeypatch):
+    monkeypatch.setattr(storage, "pa", None)
+    assert storage.engagement_by("keyword").loc["ai", "posts"] == 3
+    assert not os.path.exists(storage.SNAPSHOT_FILE)